@@ -1,13 +1,31 @@
+from decimal import Decimal
+from itertools import islice
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import redirect, render
 from django.contrib import messages
 from django import forms
+from django.db import transaction
+from django.db.models import Prefetch, Exists, OuterRef, F, Value
+from django.db.models.functions import Greatest
 from django.utils.safestring import mark_safe
 
 from .models import Product, ProductDiscount, ProductInventoryLog
 
+# Maximum number of product IDs per bulk price UPDATE statement
+BULK_PRICE_UPDATE_CHUNK_SIZE = 1000
+
+# Changelist markup that never varies is built once at import time
+OUT_OF_STOCK_HTML = mark_safe('<span style="color: red; font-weight: bold;">Out of stock</span>')
+LOW_STOCK_TEMPLATE = '<span style="color: orange; font-weight: bold;">Low stock ({})</span>'
+IN_STOCK_TEMPLATE = '<span style="color: green;">In stock ({})</span>'
+NO_DISCOUNT_HTML = mark_safe('<span style="color: grey;">No</span>')
+DISCOUNT_TEMPLATE = '<span style="color: green;">{}%</span>'
+
 
 class ProductDiscountInline(admin.TabularInline):
     model = ProductDiscount
@@ -28,6 +46,19 @@ class ProductInventoryLogInline(admin.TabularInline):
         return False
 
 
+class ProductChangeList(ChangeList):
+    """
+    Changelist that only loads the columns shown in list_display,
+    leaving large fields such as description out of each row.
+    """
+    def get_queryset(self, request, *args, **kwargs):
+        qs = super().get_queryset(request, *args, **kwargs)
+        return qs.only(
+            'id', 'name', 'sku', 'price', 'inventory_quantity',
+            'updated_at', 'last_inventory_update'
+        )
+
+
 class BulkPriceUpdateForm(forms.Form):
     """
     Form for bulk price update action.
@@ -65,17 +96,36 @@ class ProductAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
     
+    def get_changelist(self, request, **kwargs):
+        return ProductChangeList
+    
+    def get_queryset(self, request):
+        """
+        Prefetch active discounts so the changelist doesn't query per row.
+        """
+        qs = super().get_queryset(request)
+        return qs.prefetch_related(
+            Prefetch(
+                'discounts',
+                queryset=ProductDiscount.objects.filter(active=True),
+                to_attr='_active_discounts'
+            )
+        ).annotate(
+            _has_discount=Exists(
+                ProductDiscount.objects.filter(product=OuterRef('pk'), active=True)
+            )
+        )
+    
     def inventory_status(self, obj):
         """
         Display inventory status with color coding.
         """
         if obj.inventory_quantity <= 0:
-            return format_html('<span style="color: red; font-weight: bold;">Out of stock</span>')
+            return OUT_OF_STOCK_HTML
         elif obj.inventory_quantity < 10:
-            return format_html('<span style="color: orange; font-weight: bold;">Low stock ({})</span>', 
-                              obj.inventory_quantity)
+            return format_html(LOW_STOCK_TEMPLATE, obj.inventory_quantity)
         else:
-            return format_html('<span style="color: green;">In stock ({})</span>', obj.inventory_quantity)
+            return format_html(IN_STOCK_TEMPLATE, obj.inventory_quantity)
     
     inventory_status.short_description = 'Inventory Status'
     
@@ -83,25 +133,22 @@ class ProductAdmin(admin.ModelAdmin):
         """
         Check if product has any active discounts.
         """
-        active_discounts = obj.discounts.filter(active=True)
-        if active_discounts.exists():
-            discount = active_discounts.first()
+        if obj._has_discount:
+            discount = obj._active_discounts[0]
             # Format the decimal value before passing it to format_html
             formatted_value = f"{float(discount.discount_percent):.1f}"
-            return format_html('<span style="color: green;">{}</span>', formatted_value + '%')
-        return format_html('<span style="color: grey;">No</span>')
+            return format_html(DISCOUNT_TEMPLATE, formatted_value)
+        return NO_DISCOUNT_HTML
     
     has_discount.short_description = 'Discount'
     
     def bulk_price_update(self, request, queryset):
         """
         Custom action for bulk price updates.
-        This action redirects to a custom form page.
+        This action renders an intermediate form page carrying the selected IDs.
         """
-        # Get selected object IDs from the queryset
         selected_ids = [str(pk) for pk in queryset.values_list('pk', flat=True)]
-        request.session['selected_products'] = selected_ids
-        return redirect('admin:bulk-price-update')
+        return self._render_bulk_price_update_form(request, BulkPriceUpdateForm(), selected_ids)
     
     bulk_price_update.short_description = "Update prices in bulk"
     
@@ -109,58 +156,54 @@ class ProductAdmin(admin.ModelAdmin):
         """
         Custom view for bulk price update form.
         """
-        if request.method == 'POST':
-            form = BulkPriceUpdateForm(request.POST)
-            if form.is_valid():
-                action = form.cleaned_data['action']
-                value = form.cleaned_data['value']
-                
-                # Get selected products from the session
-                selected_ids = request.session.get('selected_products', [])
-                queryset = self.model.objects.filter(id__in=selected_ids)
-                
-                updated_count = 0
-                
-                for product in queryset:
-                    original_price = product.price
-                    new_price = original_price
-                    
-                    # Apply the selected price change
-                    if action == 'increase_percent':
-                        new_price = original_price * (1 + (value / 100))
-                    elif action == 'decrease_percent':
-                        new_price = original_price * (1 - (value / 100))
-                    elif action == 'increase_amount':
-                        new_price = original_price + value
-                    elif action == 'decrease_amount':
-                        new_price = max(0, original_price - value)
-                    elif action == 'set_amount':
-                        new_price = value
-                    
-                    product.price = new_price
-                    product.save()
-                    updated_count += 1
-                
-                # Clear the session
-                if 'selected_products' in request.session:
-                    del request.session['selected_products']
-                
-                messages.success(request, f"Successfully updated prices for {updated_count} products.")
-                return redirect('admin:products_product_changelist')
-                
-        else:
-            form = BulkPriceUpdateForm()
-            # Check if we have selected products in session
-            selected_products = request.session.get('selected_products', [])
+        # Selected products are posted back as hidden fields by the form page
+        selected_ids = request.POST.getlist('_selected')
+        
+        if not selected_ids:
+            messages.error(request, "No products selected. Please select products first.")
+            return redirect('admin:products_product_changelist')
+        
+        form = BulkPriceUpdateForm(request.POST)
+        if form.is_valid():
+            action = form.cleaned_data['action']
+            value = form.cleaned_data['value']
+            
+            # Apply the selected price change as one UPDATE per chunk of IDs
+            if action == 'increase_percent':
+                new_price = F('price') * (1 + (value / 100))
+            elif action == 'decrease_percent':
+                new_price = F('price') * (1 - (value / 100))
+            elif action == 'increase_amount':
+                new_price = F('price') + value
+            elif action == 'decrease_amount':
+                new_price = Greatest(F('price') - value, Value(Decimal('0')))
+            else:
+                new_price = value
             
-            # If no products selected, show error
-            if not selected_products:
-                messages.error(request, "No products selected. Please select products first.")
-                return redirect('admin:products_product_changelist')
+            # queryset.update() skips auto_now, so stamp updated_at explicitly.
+            # Chunking keeps each statement under the driver's parameter limit
+            # and its lock footprint small. If per-row processing is ever
+            # reintroduced, lock with select_for_update(skip_locked=True) instead
+            # of waiting on rows a webhook is already updating.
+            updated_at = timezone.now()
+            updated_count = 0
+            ids = iter(selected_ids)
+            with transaction.atomic():
+                while chunk := list(islice(ids, BULK_PRICE_UPDATE_CHUNK_SIZE)):
+                    updated_count += self.model.objects.filter(id__in=chunk).update(
+                        price=new_price, updated_at=updated_at
+                    )
+            
+            messages.success(request, f"Successfully updated prices for {updated_count} products.")
+            return redirect('admin:products_product_changelist')
         
+        return self._render_bulk_price_update_form(request, form, selected_ids)
+    
+    def _render_bulk_price_update_form(self, request, form, selected_ids):
         context = {
             'form': form,
-            'selected_count': len(request.session.get('selected_products', [])),
+            'selected_ids': selected_ids,
+            'selected_count': len(selected_ids),
             'title': 'Bulk Price Update',
             'opts': self.model._meta,
         }
@@ -183,6 +226,7 @@ class ProductDiscountAdmin(admin.ModelAdmin):
     list_filter = ('active', 'start_date', 'end_date')
     search_fields = ('name', 'product__name', 'product__sku')
     autocomplete_fields = ['product']
+    list_select_related = ('product',)
 
 
 @admin.register(ProductInventoryLog)
@@ -192,6 +236,7 @@ class ProductInventoryLogAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'product__sku', 'notes')
     readonly_fields = ('timestamp', 'previous_quantity', 'new_quantity', 'change')
     autocomplete_fields = ['product']
+    list_select_related = ('product',)
     
     def has_add_permission(self, request):
         # Inventory logs should only be created by the system
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.security, deploy=True)
+def check_webhook_secret(app_configs, **kwargs):
+    """
+    Warn when Shopify webhooks can't be verified, so every one is rejected.
+    """
+    if getattr(settings, 'SHOPIFY_WEBHOOK_SECRET', ''):
+        return []
+    return [
+        Warning(
+            'SHOPIFY_WEBHOOK_SECRET is not set.',
+            hint='Webhooks are rejected unless DEBUG is on. Set it to the shared secret from Shopify.',
+            id='products.W001',
+        )
+    ]
@@ -0,0 +1,389 @@
+"""
+Text embeddings for semantic product search.
+
+Each product's embedding is computed once when its text changes and stored on
+the row as float16 bytes. The stored embeddings are stacked into one
+L2-normalized float32 matrix, so a query is ranked against every product with
+a single matrix-vector product. When FAISS is installed, an HNSW index over the
+same matrix answers queries in sub-linear time instead. Both are built by the
+rebuild_embedding_matrix task and saved to EMBEDDING_MATRIX_PATH and
+EMBEDDING_INDEX_PATH; each process reloads them when the files change.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+# Import these conditionally to allow migrations to run
+SENTENCE_TRANSFORMER_IMPORT_ERROR = None
+SPACY_IMPORT_ERROR = None
+
+try:
+    import spacy
+except ImportError as e:
+    SPACY_IMPORT_ERROR = str(e)
+    spacy = None
+
+try:
+    import torch
+    from sentence_transformers import SentenceTransformer
+except ImportError as e:
+    SENTENCE_TRANSFORMER_IMPORT_ERROR = str(e)
+    SentenceTransformer = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Number of semantically similar products returned for a query
+SEMANTIC_SEARCH_LIMIT = 20
+# Products read per query while building the embedding matrix
+EMBEDDING_BUILD_CHUNK_SIZE = 2000
+# Texts per forward pass when encoding with sentence-transformers or spaCy
+ENCODE_BATCH_SIZE = 64
+# spaCy pipeline components not needed for Doc.vector, which only uses tok2vec
+SPACY_DISABLED_COMPONENTS = ['parser', 'ner', 'tagger', 'lemmatizer', 'attribute_ruler']
+# Graph neighbours per node and search breadth of the FAISS HNSW index
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+
+# Loaded at most once per process, see _get_model()
+_embedding_model = None
+_model_lock = threading.Lock()
+
+# path -> (file mtime, loaded contents) for the matrix and index files
+_loaded_files = {}
+_load_lock = threading.Lock()
+
+
+def get_embedding_matrix_path():
+    return getattr(
+        settings, 'EMBEDDING_MATRIX_PATH',
+        os.path.join(settings.BASE_DIR, 'products', 'data', 'embedding_matrix.npz')
+    )
+
+
+def get_embedding_index_path():
+    return getattr(
+        settings, 'EMBEDDING_INDEX_PATH',
+        os.path.join(settings.BASE_DIR, 'products', 'data', 'embedding_index.faiss')
+    )
+
+
+def get_product_text(name, sku, description):
+    """
+    Text representation of a product used for its embedding.
+    """
+    return f"{name} {sku} {description}"
+
+
+def get_text_hash(text):
+    """
+    Stable hash of the text an embedding was computed from.
+    """
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def embedding_to_bytes(embedding):
+    """
+    Serialize an embedding for Product.embedding; float16 halves its size.
+    """
+    return np.asarray(embedding, dtype=np.float16).tobytes()
+
+
+def embedding_from_bytes(data):
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+
+def quantize_embedding(embedding):
+    """
+    Scale a normalized embedding to int8 bytes, a quarter of its float32 size.
+    """
+    return np.clip(np.round(np.asarray(embedding) * 127), -128, 127).astype(np.int8).tobytes()
+
+
+def dequantize_embedding(data):
+    return np.frombuffer(data, dtype=np.int8).astype(np.float32) / 127
+
+
+def get_embedding_cache_key(text):
+    """
+    Cache key for the embedding of text.
+    A content digest, unlike hash(), is the same in every process.
+    """
+    return f"emb8:{hashlib.blake2b(text.encode(), digest_size=8).hexdigest()}"
+
+
+def _get_model():
+    """
+    Load the embedding model on first use; None if no model is available.
+    The lock keeps concurrent requests from each loading their own copy.
+    """
+    global _embedding_model
+
+    if _embedding_model is not None:
+        return _embedding_model
+
+    with _model_lock:
+        if _embedding_model is None:
+            # First try sentence-transformers
+            if SentenceTransformer is not None:
+                try:
+                    model = SentenceTransformer('all-MiniLM-L6-v2')
+                    model.eval()
+                    _embedding_model = model
+                except Exception:
+                    _embedding_model = None
+
+            # Fall back to spaCy if needed
+            if _embedding_model is None and spacy is not None:
+                try:
+                    _embedding_model = spacy.load(
+                        'en_core_web_md', disable=SPACY_DISABLED_COMPONENTS
+                    )
+                except Exception:
+                    return None
+
+    return _embedding_model
+
+
+def _encode_many(texts):
+    """
+    Compute normalized embeddings for texts in one batched model call.
+    Returns None on failure.
+    """
+    try:
+        model = _get_model()
+        if model is None:
+            return None
+
+        # Generate embeddings based on model type
+        if SentenceTransformer is not None and isinstance(model, SentenceTransformer):
+            # No autograd bookkeeping is needed for inference
+            with torch.inference_mode():
+                return list(model.encode(
+                    texts,
+                    batch_size=ENCODE_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ))
+        elif spacy is not None:  # spaCy model
+            embeddings = []
+            for doc in model.pipe(texts, batch_size=ENCODE_BATCH_SIZE, n_process=1):
+                embedding = doc.vector
+                norm = np.linalg.norm(embedding)
+                embeddings.append(embedding / norm if norm > 0 else embedding)
+            return embeddings
+        return None
+    except Exception:
+        # In case of errors, return None
+        return None
+
+
+def get_embeddings(texts):
+    """
+    Get embeddings for a list of texts, using cache when possible.
+    
+    Cached embeddings are fetched with one get_many() and the misses stored
+    with one set_many(), quantized to int8. Texts that cannot be embedded
+    map to None.
+    """
+    # Check if AI libraries are available
+    if SENTENCE_TRANSFORMER_IMPORT_ERROR and SPACY_IMPORT_ERROR:
+        return [None] * len(texts)
+
+    keys = [get_embedding_cache_key(text) for text in texts]
+    embeddings = {key: dequantize_embedding(data) for key, data in cache.get_many(keys).items()}
+
+    # Encode each distinct missing text once, all in a single call
+    missing = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+    computed = {}
+    if missing:
+        encoded = _encode_many(list(missing.values()))
+        if encoded is not None:
+            computed = dict(zip(missing, encoded))
+
+    if computed:
+        cache.set_many(
+            {key: quantize_embedding(embedding) for key, embedding in computed.items()},
+            timeout=86400  # Cache for 24 hours
+        )
+        embeddings.update(computed)
+
+    return [embeddings.get(key) for key in keys]
+
+
+def get_embedding(text):
+    """
+    Get embedding for text, using cache when possible.
+    """
+    return get_embeddings([text])[0]
+
+
+def build_embedding_matrix():
+    """
+    Stack the stored product embeddings and save the matrix for search.
+    
+    Products without an up-to-date stored embedding, such as rows written by
+    bulk imports, are embedded here and stored.
+    Returns the number of products in the matrix.
+    """
+    from .models import Product
+
+    product_ids = []
+    embeddings = []
+    stale = []
+    products = Product.objects.order_by().values_list(
+        'id', 'name', 'sku', 'description', 'embedding', 'embedding_hash'
+    )
+    for product_id, name, sku, description, stored, stored_hash in products.iterator(
+        chunk_size=EMBEDDING_BUILD_CHUNK_SIZE
+    ):
+        text = get_product_text(name, sku, description)
+        if stored is not None and stored_hash == get_text_hash(text):
+            product_ids.append(product_id)
+            embeddings.append(embedding_from_bytes(stored))
+        else:
+            stale.append((product_id, text))
+
+    # Embed stale products a batch at a time and store the results
+    for start in range(0, len(stale), EMBEDDING_BUILD_CHUNK_SIZE):
+        batch = stale[start:start + EMBEDDING_BUILD_CHUNK_SIZE]
+        refreshed = []
+        for (product_id, text), embedding in zip(batch, get_embeddings([text for _, text in batch])):
+            if embedding is None:
+                continue
+            product_ids.append(product_id)
+            embeddings.append(embedding)
+            refreshed.append(Product(
+                id=product_id,
+                embedding=embedding_to_bytes(embedding),
+                embedding_hash=get_text_hash(text)
+            ))
+        Product.objects.bulk_update(refreshed, ['embedding', 'embedding_hash'])
+
+    if not embeddings:
+        # Drop any earlier matrix and index so search stops ranking products
+        # that no longer have embeddings
+        for path in (get_embedding_matrix_path(), get_embedding_index_path()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return 0
+
+    matrix = np.vstack(embeddings).astype(np.float32)
+    ids = np.asarray(product_ids, dtype=np.int64)
+
+    # Write to temporary files and swap them in so readers never see a partial file
+    path = get_embedding_matrix_path()
+    temp_path = f"{path}.tmp.npz"
+    np.savez(temp_path, matrix=matrix, product_ids=ids)
+    os.replace(temp_path, path)
+
+    if faiss is not None:
+        index = faiss.IndexIDMap(
+            faiss.IndexHNSWFlat(matrix.shape[1], HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        )
+        faiss.downcast_index(index.index).hnsw.efSearch = HNSW_EF_SEARCH
+        index.add_with_ids(matrix, ids)
+
+        path = get_embedding_index_path()
+        temp_path = f"{path}.tmp"
+        faiss.write_index(index, temp_path)
+        os.replace(temp_path, path)
+
+    return len(product_ids)
+
+
+def _load_file(path, loader):
+    """
+    Return loader(path), calling it again only when the file has changed.
+    Returns None if the file does not exist.
+    """
+    try:
+        version = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    loaded = _loaded_files.get(path)
+    if loaded is None or loaded[0] != version:
+        with _load_lock:
+            loaded = _loaded_files.get(path)
+            if loaded is None or loaded[0] != version:
+                loaded = (version, loader(path))
+                _loaded_files[path] = loaded
+
+    return loaded[1]
+
+
+def _load_matrix(path):
+    with np.load(path) as data:
+        return data['matrix'], data['product_ids']
+
+
+def get_embedding_matrix():
+    """
+    Return the (matrix, product_ids) saved by build_embedding_matrix().
+    Both are None until it has run.
+    """
+    return _load_file(get_embedding_matrix_path(), _load_matrix) or (None, None)
+
+
+def get_embedding_index():
+    """
+    Return the FAISS index saved by build_embedding_matrix(), or None.
+    """
+    if faiss is None:
+        return None
+    return _load_file(get_embedding_index_path(), faiss.read_index)
+
+
+def rank_products(query_embedding, limit=SEMANTIC_SEARCH_LIMIT):
+    """
+    Return the IDs of the products most similar to the query, best first.
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+
+    index = get_embedding_index()
+    if index is not None and query.shape == (index.d,):
+        # Approximate nearest neighbours from the HNSW graph
+        _, ids = index.search(query.reshape(1, -1), limit)
+        # FAISS pads with -1 when the index holds fewer than limit products
+        return [int(product_id) for product_id in ids[0] if product_id != -1]
+
+    matrix, product_ids = get_embedding_matrix()
+    if matrix is None or not len(product_ids):
+        return []
+
+    if query.shape != (matrix.shape[1],):
+        # The matrix was built with a different embedding model
+        return []
+
+    # Rows are normalized, so one matrix-vector product gives every cosine similarity
+    scores = matrix @ query
+
+    if len(scores) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top])]
+
+    return product_ids[top].tolist()
+
+
+def schedule_embedding_matrix_rebuild():
+    """
+    Queue a rebuild of the embedding matrix, at most once per rebuild delay.
+    Changes made in the meantime are picked up by the queued rebuild.
+    """
+    from .tasks import rebuild_embedding_matrix
+
+    delay = getattr(settings, 'EMBEDDING_MATRIX_REBUILD_DELAY', 60)
+    if cache.add('embedding_matrix_rebuild_scheduled', True, timeout=delay):
+        rebuild_embedding_matrix.apply_async(countdown=delay)
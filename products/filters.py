@@ -1,6 +1,6 @@
 import django_filters
-from django.db.models import Q
-from .models import Product
+from django.db.models import Q, Exists, OuterRef
+from .models import Product, ProductDiscount
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -33,9 +33,10 @@ class ProductFilter(django_filters.FilterSet):
     
     def filter_has_discount(self, queryset, name, value):
         """
-        Filter for products that have active discounts.
+        Filter for products that have (or don't have) active discounts.
         """
+        # Semijoin instead of JOIN + DISTINCT
+        active_discounts = ProductDiscount.objects.filter(product=OuterRef('pk'), active=True)
         if value:
-            # Find products with active discounts
-            return queryset.filter(discounts__active=True).distinct()
-        return queryset 
\ No newline at end of file
+            return queryset.filter(Exists(active_discounts))
+        return queryset.filter(~Exists(active_discounts)) 
\ No newline at end of file
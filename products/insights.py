@@ -0,0 +1,95 @@
+"""
+Inventory insights shown by the product insights endpoint.
+
+Computing them scans the products and recent inventory logs, so the result is
+cached under INSIGHTS_CACHE_KEY and refreshed by the compute_insights task.
+"""
+import heapq
+from operator import itemgetter
+
+from django.db.models import Avg, Count, Sum, Q
+from django.utils import timezone
+
+from .models import Product, ProductInventoryLog
+from .serializers import ProductSerializer
+
+INSIGHTS_CACHE_KEY = 'product_insights'
+# Seconds cached insights stay valid; the beat task refreshes them more often
+INSIGHTS_CACHE_TIMEOUT = 30 * 60
+
+
+def get_product_insights():
+    """
+    Get insights about products inventory.
+    """
+    # Get basic stats in a single query
+    stats = Product.objects.aggregate(
+        total=Count('id'),
+        low=Count('id', filter=Q(inventory_quantity__lt=10)),
+        out_of_stock=Count('id', filter=Q(inventory_quantity=0)),
+        avg_price=Avg('price')
+    )
+    total_products = stats['total']
+    low_stock_count = stats['low']
+    out_of_stock_count = stats['out_of_stock']
+    avg_price = stats['avg_price'] or 0
+    
+    # Percentage calculations
+    low_stock_percentage = (low_stock_count / total_products * 100) if total_products else 0
+    out_of_stock_percentage = (out_of_stock_count / total_products * 100) if total_products else 0
+    
+    # Detect trending products based on inventory changes
+    # Products with most inventory movement in the last 30 days
+    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
+    
+    # One grouped pass over recent logs gives every trending measure
+    movement = list(
+        ProductInventoryLog.objects.filter(timestamp__gte=thirty_days_ago)
+        .values('product_id')
+        .annotate(
+            log_count=Count('id'),
+            total_increase=Sum('change', filter=Q(change__gt=0)),
+            total_decrease=Sum('change', filter=Q(change__lt=0))
+        )
+        .order_by()
+    )
+    
+    # Products with most inventory logs
+    active_ids = [
+        row['product_id'] for row in heapq.nlargest(5, movement, key=itemgetter('log_count'))
+    ]
+    # Products with biggest positive inventory changes (restocked items)
+    restocked_ids = [
+        row['product_id'] for row in heapq.nlargest(
+            5, (row for row in movement if row['total_increase']),
+            key=itemgetter('total_increase')
+        )
+    ]
+    # Products with biggest negative inventory changes (selling fast)
+    selling_ids = [
+        row['product_id'] for row in heapq.nsmallest(
+            5, (row for row in movement if row['total_decrease']),
+            key=itemgetter('total_decrease')
+        )
+    ]
+    
+    trending = Product.objects.defer('embedding').in_bulk(set(active_ids + restocked_ids + selling_ids))
+    active_products = [trending[pk] for pk in active_ids if pk in trending]
+    restocked_products = [trending[pk] for pk in restocked_ids if pk in trending]
+    selling_products = [trending[pk] for pk in selling_ids if pk in trending]
+    
+    insights = {
+        'total_products': total_products,
+        'low_stock_count': low_stock_count,
+        'low_stock_percentage': round(low_stock_percentage, 1),
+        'out_of_stock_count': out_of_stock_count,
+        'out_of_stock_percentage': round(out_of_stock_percentage, 1),
+        'avg_price': round(float(avg_price), 2) if avg_price else 0,
+        'trending_products': {
+            'most_active': ProductSerializer(active_products, many=True).data,
+            'most_restocked': ProductSerializer(restocked_products, many=True).data,
+            'selling_fast': ProductSerializer(selling_products, many=True).data,
+        }
+    }
+    
+    return insights
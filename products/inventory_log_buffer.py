@@ -0,0 +1,157 @@
+"""
+Write-combining buffer for inventory logs.
+
+Webhook handlers enqueue log entries here instead of inserting them one at a
+time. An entry joins the buffer only once the caller's transaction commits, and
+entries are bulk-inserted by a single flush on a background thread, either when
+the buffer reaches FLUSH_SIZE or FLUSH_INTERVAL seconds after the first queued
+entry. A batch that fails to insert goes back on the buffer for the next flush;
+while flushes keep failing, entries beyond MAX_BUFFERED_LOGS are dropped.
+
+Buffering is controlled by the INVENTORY_LOG_BUFFER_ENABLED setting; when it is
+off, enqueue_log() saves each log immediately.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from .models import ProductInventoryLog
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before flushing a partially filled buffer
+FLUSH_INTERVAL = 0.5
+# Number of queued logs that triggers an immediate flush
+FLUSH_SIZE = 1000
+# Queued logs beyond which new entries are dropped while flushes keep failing
+MAX_BUFFERED_LOGS = FLUSH_SIZE * 10
+
+_buffer = deque()
+_flush_lock = threading.Lock()
+_timer_lock = threading.Lock()
+_timer = None
+_dropped_logs = 0
+
+
+def enqueue_log(product_id, previous_quantity, new_quantity, change_type, notes=''):
+    """
+    Queue an inventory log entry for insertion.
+    """
+    log = ProductInventoryLog(
+        product_id=product_id,
+        previous_quantity=previous_quantity,
+        new_quantity=new_quantity,
+        change_type=change_type,
+        notes=notes
+    )
+
+    if not getattr(settings, 'INVENTORY_LOG_BUFFER_ENABLED', False):
+        log.save()
+        return
+
+    # A rolled-back inventory change must not leave a log behind
+    transaction.on_commit(lambda: _buffer_log(log))
+
+
+def _buffer_log(log):
+    global _dropped_logs
+    if len(_buffer) >= MAX_BUFFERED_LOGS:
+        # Flushes keep failing; shed new entries rather than grow without bound
+        _dropped_logs += 1
+        if _dropped_logs % FLUSH_SIZE == 1:
+            logger.error(f"Inventory log buffer is full; {_dropped_logs} logs dropped so far")
+        return
+
+    _buffer.append(log)
+    # Never flush in the caller's thread, where the insert would join its transaction
+    _schedule_flush(0 if len(_buffer) >= FLUSH_SIZE else FLUSH_INTERVAL)
+
+
+def flush(raise_errors=True):
+    """
+    Insert all queued logs in one bulk statement.
+    Returns the number of logs written.
+
+    If the insert fails the logs are put back on the buffer, and the error is
+    re-raised unless raise_errors is False.
+    """
+    with _flush_lock:
+        batch = []
+        while _buffer:
+            batch.append(_buffer.popleft())
+
+        if not batch:
+            return 0
+
+        try:
+            # All or nothing, so a batch put back is never partly written
+            with transaction.atomic():
+                ProductInventoryLog.objects.bulk_create(batch, batch_size=FLUSH_SIZE)
+        except IntegrityError:
+            # One bad entry, such as a log for a since-deleted product, fails
+            # the whole statement; save the others one at a time
+            return _save_each(batch)
+        except Exception as e:
+            _buffer.extendleft(reversed(batch))
+            logger.error(f"Error flushing {len(batch)} inventory logs, kept for retry: {str(e)}")
+            if raise_errors:
+                raise
+            return 0
+
+        return len(batch)
+
+
+def _save_each(batch):
+    written = 0
+    for log in batch:
+        try:
+            with transaction.atomic():
+                log.save()
+            written += 1
+        except IntegrityError as e:
+            logger.error(f"Dropping inventory log for product {log.product_id}: {str(e)}")
+    return written
+
+
+def _schedule_flush(delay=FLUSH_INTERVAL, retry=False):
+    """
+    Start the flush timer unless one is pending; at most one runs at a time.
+    A zero delay brings a pending flush forward, except a retry after a failure.
+    """
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            if delay or _timer.interval == 0 or _timer.retry:
+                return
+            # If it has already fired, the extra flush finds little to do
+            _timer.cancel()
+        _timer = threading.Timer(delay, _flush_from_timer)
+        _timer.retry = retry
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_from_timer():
+    global _timer
+    with _timer_lock:
+        # A timer cancelled too late must not forget its replacement
+        if _timer is threading.current_thread():
+            _timer = None
+    try:
+        flush()
+    except Exception:
+        # flush() logged the error and put the batch back; retry after a pause
+        _schedule_flush(retry=True)
+    else:
+        if _buffer:
+            _schedule_flush()
+    finally:
+        # The timer thread opened its own connection; don't leak it
+        connection.close()
+
+
+atexit.register(flush, raise_errors=False)
@@ -1,12 +1,16 @@
 from decimal import Decimal
-import random
+
+import numpy as np
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
 
 from products.models import Product, ProductDiscount, ProductInventoryLog
 
+BATCH_SIZE = 1000
+
 
 class Command(BaseCommand):
     help = 'Creates test data for the application'
@@ -15,6 +19,10 @@ class Command(BaseCommand):
         parser.add_argument('--products', type=int, default=20, help='Number of products to create')
         parser.add_argument('--users', action='store_true', help='Create test users and groups')
         parser.add_argument('--flush', action='store_true', help='Flush existing data before creating new')
+        parser.add_argument(
+            '--skip-existing', action='store_true',
+            help='Skip creating products if any test product already exists'
+        )
 
     def handle(self, *args, **options):
         if options['flush']:
@@ -28,8 +36,11 @@ class Command(BaseCommand):
                 User.objects.filter(is_superuser=False).delete()
                 Group.objects.all().delete()
         
-        # Create products
-        self.create_products(options['products'])
+        # Create products, unless this is a re-run against already seeded data
+        if options['skip_existing'] and self.test_products_exist(options['products']):
+            self.stdout.write('Test products already exist, skipping product creation')
+        else:
+            self.create_products(options['products'])
         
         # Create users if requested
         if options['users']:
@@ -37,52 +48,79 @@ class Command(BaseCommand):
             
         self.stdout.write(self.style.SUCCESS('Successfully created test data'))
         
+    def test_products_exist(self, count):
+        """Check whether any of the SKUs create_products() would use are taken."""
+        skus = [f'TP{i + 1:03d}' for i in range(count)]
+        return Product.objects.filter(sku__in=skus).exists()
+    
     def create_products(self, count):
         """Create test products with discounts and inventory logs."""
         self.stdout.write(f'Creating {count} test products...')
         
-        products = []
-        for i in range(1, count + 1):
-            # Create base product
-            product = Product(
-                name=f'Test Product {i}',
-                sku=f'TP{i:03d}',
-                price=Decimal(str(round(random.uniform(9.99, 99.99), 2))),
-                inventory_quantity=random.randint(0, 100),
-                description=f'This is test product {i} with some description text for testing purposes.',
-                shopify_id=f'shopify-{i:05d}' if random.random() > 0.3 else None
-            )
-            product.save()
-            products.append(product)
+        # Draw all random values up front as arrays
+        rng = np.random.default_rng()
+        now = timezone.now()
+        
+        prices = np.round(rng.uniform(9.99, 99.99, count), 2)
+        quantities = rng.integers(0, 101, count)
+        has_shopify_id = rng.random(count) > 0.3
+        
+        has_discount = rng.random(count) > 0.6
+        discount_percents = rng.integers(5, 31, count)
+        discount_active = rng.random(count) > 0.3
+        has_end_date = rng.random(count) > 0.5
+        end_days = rng.integers(1, 31, count)
+        
+        # Map each inventory log to the index of its product
+        log_counts = rng.integers(0, 6, count)
+        log_products = np.repeat(np.arange(count), log_counts)
+        total_logs = len(log_products)
+        previous_quantities = rng.integers(0, 101, total_logs)
+        new_quantities = rng.integers(0, 101, total_logs)
+        change_types = rng.choice(['manual', 'webhook', 'import'], total_logs)
+        log_days = rng.integers(0, 31, total_logs)
+        
+        with transaction.atomic():
+            # Create base products
+            products = [
+                Product(
+                    name=f'Test Product {i + 1}',
+                    sku=f'TP{i + 1:03d}',
+                    price=Decimal(f'{prices[i]:.2f}'),
+                    inventory_quantity=int(quantities[i]),
+                    description=f'This is test product {i + 1} with some description text for testing purposes.',
+                    shopify_id=f'shopify-{i + 1:05d}' if has_shopify_id[i] else None
+                )
+                for i in range(count)
+            ]
+            products = Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
             
-            # Maybe create a discount
-            if random.random() > 0.6:
-                discount = ProductDiscount(
-                    product=product,
-                    name=f'Discount for {product.name}',
-                    discount_percent=Decimal(str(random.randint(5, 30))),
-                    active=random.random() > 0.3,
-                    start_date=timezone.now(),
-                    end_date=timezone.now() + timezone.timedelta(days=random.randint(1, 30)) if random.random() > 0.5 else None
+            discounts = [
+                ProductDiscount(
+                    product=products[i],
+                    name=f'Discount for {products[i].name}',
+                    discount_percent=Decimal(int(discount_percents[i])),
+                    active=bool(discount_active[i]),
+                    start_date=now,
+                    end_date=now + timezone.timedelta(days=int(end_days[i])) if has_end_date[i] else None
                 )
-                discount.save()
+                for i in np.flatnonzero(has_discount)
+            ]
             
-            # Create some inventory logs
-            for _ in range(random.randint(0, 5)):
-                prev_qty = random.randint(0, 100)
-                new_qty = random.randint(0, 100)
-                change_type = random.choice(['manual', 'webhook', 'import'])
-                
-                log = ProductInventoryLog(
-                    product=product,
-                    previous_quantity=prev_qty,
-                    new_quantity=new_qty,
-                    change=new_qty - prev_qty,
-                    change_type=change_type,
-                    notes=f'Test log for {product.name}',
-                    timestamp=timezone.now() - timezone.timedelta(days=random.randint(0, 30))
+            logs = [
+                ProductInventoryLog(
+                    product=products[i],
+                    previous_quantity=int(previous_quantities[j]),
+                    new_quantity=int(new_quantities[j]),
+                    change_type=str(change_types[j]),
+                    notes=f'Test log for {products[i].name}',
+                    timestamp=now - timezone.timedelta(days=int(log_days[j]))
                 )
-                log.save()
+                for j, i in enumerate(log_products)
+            ]
+            
+            ProductDiscount.objects.bulk_create(discounts, batch_size=BATCH_SIZE)
+            ProductInventoryLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
         
         self.stdout.write(f'Created {len(products)} products')
     
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_rename_products_pr_sku_58d1ab_idx_products_pr_sku_ca0cdc_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["price", "inventory_quantity"],
+                name="products_pr_price_2dd217_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("inventory_quantity__lt", 10)),
+                fields=["inventory_quantity"],
+                name="product_low_stock_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productdiscount",
+            index=models.Index(
+                fields=["product", "active"], name="products_pr_product_bf0c0a_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.10 on 2026-10-15 10:41
+
+from django.db import migrations
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_products_pr_price_2dd217_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productinventorylog",
+            name="change",
+            field=products.models.QuantityChangeField(),
+        ),
+    ]
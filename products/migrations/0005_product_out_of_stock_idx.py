@@ -0,0 +1,21 @@
+# Generated by Django 4.2.10 on 2026-10-15 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_alter_productinventorylog_change"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("inventory_quantity", 0)),
+                fields=["inventory_quantity"],
+                name="product_out_of_stock_idx",
+            ),
+        ),
+    ]
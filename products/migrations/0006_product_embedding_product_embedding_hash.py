@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-15 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_out_of_stock_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="embedding",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="embedding_hash",
+            field=models.CharField(blank=True, default="", editable=False, max_length=40),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.10 on 2026-10-15 23:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """
+    AddIndex that only touches the database on PostgreSQL, where GIN
+    indexes exist. Other databases just record the index in the model state.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_product_embedding_product_embedding_hash"),
+    ]
+
+    operations = [
+        AddPostgresIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "name", "sku", "description", config="english"
+                ),
+                name="product_fts",
+            ),
+        ),
+    ]
@@ -1,8 +1,17 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models import Case, When, Value, Q
+from django.db.models.functions import Now
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 
 
+# Full-text document for product search; the product_fts index is built on
+# exactly this expression, so queries must use it unchanged to hit the index
+PRODUCT_SEARCH_VECTOR = SearchVector('name', 'sku', 'description', config='english')
+
+
 class Product(models.Model):
     """
     Product model for storing product information.
@@ -18,6 +27,10 @@ class Product(models.Model):
     last_inventory_update = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True)
     shopify_id = models.CharField(max_length=100, blank=True, null=True)
+    # float16 search embedding of name, sku and description, and the hash of
+    # the text it was computed from
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
     
     class Meta:
         ordering = ['-updated_at']
@@ -27,20 +40,90 @@ class Product(models.Model):
             models.Index(fields=['price']),
             models.Index(fields=['inventory_quantity']),
             models.Index(fields=['updated_at']),
+            models.Index(fields=['price', 'inventory_quantity']),
+            models.Index(
+                fields=['inventory_quantity'],
+                name='product_low_stock_idx',
+                condition=Q(inventory_quantity__lt=10)
+            ),
+            models.Index(
+                fields=['inventory_quantity'],
+                name='product_out_of_stock_idx',
+                condition=Q(inventory_quantity=0)
+            ),
+            # Only created on PostgreSQL, see migration 0007
+            GinIndex(PRODUCT_SEARCH_VECTOR, name='product_fts'),
         ]
     
     def __str__(self):
         return f"{self.name} ({self.sku})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded inventory quantity so save() can detect changes
+        without re-reading the row.
+        """
+        instance = super().from_db(db, field_names, values)
+        # Read from __dict__ so a deferred field isn't loaded here
+        instance._original_inventory_quantity = instance.__dict__.get('inventory_quantity')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'inventory_quantity' in fields:
+            self._original_inventory_quantity = self.inventory_quantity
+
     def save(self, *args, **kwargs):
         """
         Override save to update last_inventory_update when inventory quantity changes.
         """
-        if self.pk:
-            original = Product.objects.get(pk=self.pk)
-            if original.inventory_quantity != self.inventory_quantity:
+        update_fields = kwargs.get('update_fields')
+        if self.pk and (update_fields is None or 'inventory_quantity' in update_fields):
+            if self.inventory_quantity != getattr(self, '_original_inventory_quantity', None):
                 self.last_inventory_update = timezone.now()
+                if update_fields is not None and 'last_inventory_update' not in update_fields:
+                    kwargs['update_fields'] = list(update_fields) + ['last_inventory_update']
         super().save(*args, **kwargs)
+        self._original_inventory_quantity = self.inventory_quantity
+    
+    def update_inventory_quantity(self, new_quantity):
+        """
+        Write a new inventory quantity with a single UPDATE of the affected columns.
+        This skips save() and its post_save signals.
+        """
+        now = timezone.now()
+        fields = {'inventory_quantity': new_quantity, 'updated_at': now}
+        if new_quantity != self.inventory_quantity:
+            fields['last_inventory_update'] = now
+        
+        Product.objects.filter(pk=self.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._original_inventory_quantity = new_quantity
+
+
+class ProductDiscountQuerySet(models.QuerySet):
+    """
+    QuerySet for product discounts.
+    """
+    def with_validity(self):
+        """
+        Annotate each discount with whether it is currently valid.
+        The date comparison runs in SQL against a single NOW().
+        """
+        now = Now()
+        return self.annotate(
+            _is_valid=Case(
+                When(
+                    Q(active=True) & Q(start_date__lte=now) &
+                    (Q(end_date__isnull=True) | Q(end_date__gte=now)),
+                    then=Value(True)
+                ),
+                default=Value(False),
+                output_field=models.BooleanField()
+            )
+        )
 
 
 class ProductDiscount(models.Model):
@@ -56,17 +139,30 @@ class ProductDiscount(models.Model):
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True, blank=True)
     
+    objects = ProductDiscountQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['product', 'active']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.discount_percent}%)"
-    
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Drop any annotated validity so is_valid reflects the saved values
+        self.__dict__.pop('_is_valid', None)
+
     @property
     def is_valid(self):
         """
         Check if the discount is currently valid based on dates.
         """
+        # Use the value annotated by with_validity() when available
+        if '_is_valid' in self.__dict__:
+            return self._is_valid
         now = timezone.now()
         if not self.active:
             return False
@@ -86,6 +182,17 @@ class ProductDiscount(models.Model):
         return price - discount
 
 
+class QuantityChangeField(models.IntegerField):
+    """
+    Integer field storing new_quantity - previous_quantity.
+    The value is computed in pre_save(), which runs for bulk_create() as well as save().
+    """
+    def pre_save(self, model_instance, add):
+        value = model_instance.new_quantity - model_instance.previous_quantity
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class ProductInventoryLog(models.Model):
     """
     Model for logging inventory changes.
@@ -93,7 +200,7 @@ class ProductInventoryLog(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_logs')
     previous_quantity = models.PositiveIntegerField()
     new_quantity = models.PositiveIntegerField()
-    change = models.IntegerField()
+    change = QuantityChangeField()
     change_type = models.CharField(max_length=50, choices=[
         ('manual', 'Manual Update'),
         ('webhook', 'Webhook Update'),
@@ -107,11 +214,3 @@ class ProductInventoryLog(models.Model):
     
     def __str__(self):
         return f"{self.product.sku}: {self.previous_quantity} → {self.new_quantity}"
-    
-    def save(self, *args, **kwargs):
-        """
-        Calculate the change before saving.
-        """
-        if not self.pk and self.previous_quantity != self.new_quantity:
-            self.change = self.new_quantity - self.previous_quantity
-        super().save(*args, **kwargs)
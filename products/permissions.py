@@ -12,12 +12,14 @@ class IsInProductManagerGroup(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return request.user and request.user.is_authenticated
         
-        # Check if user is in the required group for write operations
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.groups.filter(name='Product Managers').exists()
-        )
+        if not (request.user and request.user.is_authenticated):
+            return False
+        
+        # Check if user is in the required group for write operations,
+        # caching the result for the lifetime of the request
+        if not hasattr(request, '_is_product_manager'):
+            request._is_product_manager = request.user.groups.filter(name='Product Managers').exists()
+        return request._is_product_manager
 
 
 class IsAdminUserOrReadOnly(permissions.BasePermission):
@@ -3,10 +3,11 @@ from .models import Product, ProductDiscount, ProductInventoryLog
 
 
 class ProductDiscountSerializer(serializers.ModelSerializer):
+    is_valid = serializers.BooleanField(read_only=True)
+    
     class Meta:
         model = ProductDiscount
         fields = ['id', 'name', 'discount_percent', 'active', 'start_date', 'end_date', 'is_valid']
-        read_only_fields = ['is_valid']
 
 
 class ProductInventoryLogSerializer(serializers.ModelSerializer):
@@ -25,7 +26,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
-    discounts = ProductDiscountSerializer(many=True, read_only=True)
+    discounts = serializers.SerializerMethodField()
     recent_inventory_logs = serializers.SerializerMethodField()
     
     class Meta:
@@ -35,17 +36,30 @@ class ProductDetailSerializer(serializers.ModelSerializer):
                  'discounts', 'recent_inventory_logs']
         read_only_fields = ['created_at', 'updated_at', 'last_inventory_update']
     
+    def get_discounts(self, obj):
+        # Validity is computed in SQL rather than per discount in Python
+        discounts = obj.discounts.with_validity()
+        return ProductDiscountSerializer(discounts, many=True).data
+    
     def get_recent_inventory_logs(self, obj):
-        # Get the 5 most recent inventory logs
-        logs = obj.inventory_logs.all()[:5]
-        return ProductInventoryLogSerializer(logs, many=True).data
+        """
+        Get the 5 most recent inventory logs.
+        
+        When serializing many products, the view should apply
+        Prefetch('inventory_logs', queryset=ProductInventoryLog.objects.order_by('-timestamp'),
+        to_attr='_recent_logs') so logs are loaded in a single query.
+        """
+        logs = getattr(obj, '_recent_logs', None)
+        if logs is None:
+            logs = obj.inventory_logs.all()
+        return ProductInventoryLogSerializer(logs[:5], many=True).data
 
 
 class WebhookInventoryUpdateSerializer(serializers.Serializer):
     """
     Serializer for the Shopify inventory webhook payload.
     """
-    id = serializers.CharField(required=True)
+    id = serializers.CharField(required=False)
     sku = serializers.CharField(required=False)
     inventory_quantity = serializers.IntegerField(required=True)
     
@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .embeddings import get_product_text, get_text_hash, schedule_embedding_matrix_rebuild
+from .models import Product
+
+# Fields the product embedding is computed from
+EMBEDDING_TEXT_FIELDS = {'name', 'sku', 'description'}
+
+
+@receiver(post_save, sender=Product)
+def embed_product_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Recompute the product's embedding once the change is committed,
+    but only when the text it is computed from has changed.
+    """
+    from .tasks import compute_product_embedding
+
+    if update_fields is not None and not EMBEDDING_TEXT_FIELDS & set(update_fields):
+        return
+    if EMBEDDING_TEXT_FIELDS & instance.get_deferred_fields():
+        return
+
+    text = get_product_text(instance.name, instance.sku, instance.description)
+    if get_text_hash(text) != instance.embedding_hash:
+        product_id = instance.pk
+        transaction.on_commit(lambda: compute_product_embedding.delay(product_id))
+
+
+@receiver(post_delete, sender=Product)
+def rebuild_embeddings_on_product_delete(sender, **kwargs):
+    """
+    Drop deleted products from the search matrix once the change is committed.
+    """
+    transaction.on_commit(schedule_embedding_matrix_rebuild)
@@ -1,12 +1,18 @@
+import io
 import os
 import csv
+import json
 import logging
+import tempfile
+from smtplib import SMTPException
 from datetime import datetime, timedelta
 
-from celery import shared_task, chain
+from celery import shared_task, chord
 from celery.utils.log import get_task_logger
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.db.models import Count, Sum, F, Q
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
@@ -14,23 +20,46 @@ from django.utils import timezone
 
 import pandas as pd
 
+try:
+    import pyarrow
+    from pyarrow import csv as pyarrow_csv
+except ImportError:
+    pyarrow = None
+
 from .models import Product, ProductInventoryLog
+from .insights import INSIGHTS_CACHE_KEY, INSIGHTS_CACHE_TIMEOUT, get_product_insights
+from .embeddings import (
+    build_embedding_matrix, embedding_to_bytes, get_embedding, get_product_text,
+    get_text_hash, schedule_embedding_matrix_rebuild
+)
 
 logger = get_task_logger(__name__)
 
+# Rows per statement for bulk inserts and updates
+BULK_BATCH_SIZE = 1000
 
-@shared_task
-def import_products_from_csv(file_path=None):
+# Columns read from the import CSV and the dtypes of its text columns
+CSV_COLUMNS = ('sku', 'name', 'price', 'inventory_quantity', 'description')
+CSV_REQUIRED_COLUMNS = ['sku', 'name', 'price', 'inventory_quantity']
+CSV_TEXT_DTYPES = {'sku': 'string', 'name': 'string', 'description': 'string'}
+# Rows per CSV chunk handed to one validate_and_update_inventory task
+CSV_CHUNK_SIZE = 10_000
+# Error messages carried in a task result; the full count travels as error_count
+MAX_RESULT_ERRORS = 20
+# Minimum number of inventory logs worth streaming through COPY on PostgreSQL
+COPY_MIN_ROWS = 1000
+# Product fields whose rules clean_product_row() checks before the database does
+PRODUCT_ROW_FIELDS = ('sku', 'name', 'price', 'inventory_quantity')
+
+# Report email settings, read once when the worker imports this module
+REPORT_FROM_EMAIL = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com')
+REPORT_RECIPIENTS = getattr(settings, 'INVENTORY_REPORT_RECIPIENTS', ['admin@example.com'])
+
+
+def get_import_file_path(file_path=None):
     """
-    Import products from a CSV file.
-    
-    Expected CSV format:
-    sku,name,price,inventory_quantity,description
-    
-    Returns a list of dictionaries with imported data.
+    Resolve the CSV to import, falling back to (and creating) the mock CSV.
     """
-    logger.info(f"Starting product import from CSV: {file_path}")
-    
     # Use a default file path for testing if none provided
     if file_path is None or not os.path.exists(file_path):
         # For testing purposes, use a mock CSV in the project directory
@@ -44,23 +73,293 @@ def import_products_from_csv(file_path=None):
             # Create mock data
             with open(file_path, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(['sku', 'name', 'price', 'inventory_quantity', 'description'])
-                # Add some sample products
-                writer.writerow(['SKU001', 'Test Product 1', '19.99', '100', 'This is a test product'])
-                writer.writerow(['SKU002', 'Test Product 2', '29.99', '50', 'Another test product'])
-                writer.writerow(['SKU003', 'Test Product 3', '39.99', '25', 'A third test product'])
+                writer.writerows([
+                    ['sku', 'name', 'price', 'inventory_quantity', 'description'],
+                    # Add some sample products
+                    ['SKU001', 'Test Product 1', '19.99', '100', 'This is a test product'],
+                    ['SKU002', 'Test Product 2', '29.99', '50', 'Another test product'],
+                    ['SKU003', 'Test Product 3', '39.99', '25', 'A third test product'],
+                ])
+    
+    return file_path
+
+
+def get_missing_columns(file_path):
+    """
+    Return the required columns missing from the CSV header.
+    """
+    columns = pd.read_csv(file_path, nrows=0).columns
+    return [col for col in CSV_REQUIRED_COLUMNS if col not in columns]
+
+
+def read_product_chunks(file_path, chunksize=CSV_CHUNK_SIZE, skip_rows=None):
+    """
+    Read a product CSV in chunks, yielding a list of valid product dicts per chunk.
+    
+    skip_rows is a set of row positions to leave out, such as the result of
+    find_superseded_rows().
+    """
+    # Read only the columns we use, with text columns typed up front
+    reader = pd.read_csv(
+        file_path,
+        usecols=lambda column: column in CSV_COLUMNS,
+        dtype=CSV_TEXT_DTYPES,
+        engine='c',
+        chunksize=chunksize
+    )
+    for df in reader:
+        # The reader numbers rows across chunks, so positions match the whole file
+        if skip_rows:
+            df.drop(index=df.index[df.index.isin(skip_rows)], inplace=True)
+        yield clean_product_frame(df)
+
+
+def find_superseded_rows(file_path, chunksize=CSV_CHUNK_SIZE):
+    """
+    Return the positions of rows in a product CSV that another row for the
+    same SKU replaces, by the rule in find_superseded_records().
+    
+    Chunks are imported in parallel, so a SKU repeated in two chunks would be
+    created twice or updated in either order. Skipping these rows leaves one
+    row per SKU in the whole file. Only the required columns are read.
+    """
+    reader = pd.read_csv(
+        file_path,
+        usecols=CSV_REQUIRED_COLUMNS,
+        dtype={column: CSV_TEXT_DTYPES[column] for column in ('sku', 'name')},
+        engine='c',
+        chunksize=chunksize
+    )
+    return find_superseded_records(record for df in reader for record in product_frame_records(df))
+
+
+def find_superseded_records(records):
+    """
+    Return the positions of the (position, product dict) records that another
+    record for the same SKU replaces.
+    
+    Each SKU keeps its last row that passes clean_product_row(), so a broken
+    later row can't cancel a good one. If none passes, its last row is kept
+    so the error is still reported.
+    """
+    last_valid = {}
+    last_seen = {}
+    superseded = set()
+    for position, product in records:
+        sku = product['sku']
+        previous = last_seen.get(sku)
+        try:
+            clean_product_row(product)
+        except ValidationError:
+            # An invalid row only replaces an earlier invalid one
+            if previous is not None and previous != last_valid.get(sku):
+                superseded.add(previous)
+        else:
+            if previous is not None:
+                superseded.add(previous)
+            if last_valid.get(sku) is not None:
+                superseded.add(last_valid[sku])
+            last_valid[sku] = position
+        last_seen[sku] = position
+    
+    # A SKU with a valid row drops the invalid rows that followed it
+    for sku, position in last_valid.items():
+        if last_seen[sku] != position:
+            superseded.add(last_seen[sku])
+    return superseded
+
+
+def write_import_chunk(products, file_path):
+    """
+    Save one chunk of product dicts next to the import file and return its path.
+    The validate task that loads it with load_import_chunk() removes it.
+    """
+    fd, path = tempfile.mkstemp(
+        prefix='import-chunk-', suffix='.json', dir=os.path.dirname(os.path.abspath(file_path))
+    )
+    with os.fdopen(fd, 'w') as chunk_file:
+        json.dump(products, chunk_file)
+    return path
+
+
+def load_import_chunk(path):
+    try:
+        with open(path) as chunk_file:
+            return json.load(chunk_file)
+    finally:
+        os.remove(path)
+
+
+def remove_import_chunks(signatures):
+    """
+    Remove the chunk files referenced by validate task signatures that won't run.
+    """
+    for signature in signatures:
+        chunk_path = signature.args[0].get('chunk_path')
+        if chunk_path:
+            try:
+                os.remove(chunk_path)
+            except FileNotFoundError:
+                pass
+
+
+def read_products(file_path):
+    """
+    Read a whole product CSV into a list of valid product dicts.
+    
+    Uses PyArrow's multithreaded CSV reader when it is installed. It cannot
+    read in chunks, so it is only used when the whole file is wanted.
+    """
+    if pyarrow is None:
+        return [product for chunk in read_product_chunks(file_path) for product in chunk]
+    
+    header = pd.read_csv(file_path, nrows=0).columns
+    columns = [column for column in CSV_COLUMNS if column in header]
+    # Read every column as text: PyArrow fixes inferred types from the first
+    # block, so a malformed number later on would fail the whole file, and
+    # inferred SKUs would lose leading zeros. clean_product_frame() coerces
+    # the numeric columns.
+    table = pyarrow_csv.read_csv(
+        file_path,
+        convert_options=pyarrow_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={column: pyarrow.string() for column in columns},
+            strings_can_be_null=True
+        )
+    )
+    return clean_product_frame(table.to_pandas())
+
+
+def clean_product_frame(df):
+    """
+    Drop invalid rows from a product DataFrame and return the rest as dicts.
+    """
+    records = list(product_frame_records(df))
+    # Exports often repeat a SKU; only one of its rows needs writing
+    superseded = find_superseded_records(records)
+    return [product for position, product in records if position not in superseded]
+
+
+def product_frame_records(df):
+    """
+    Coerce a product DataFrame's numeric columns and drop incomplete rows.
+    Returns (row position, product dict) pairs.
+    """
+    # The CSV parsers already yield numeric columns for well-formed files;
+    # only coerce when malformed values left a column as text
+    for column in ('price', 'inventory_quantity'):
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    
+    # Replace NaN with empty string for string columns
+    df = df.fillna({'description': ''})
+    
+    # Filter out rows with invalid data, without keeping a second frame alive
+    df.dropna(subset=CSV_REQUIRED_COLUMNS, inplace=True)
+    
+    # Convert to list of dictionaries for further processing. Zipping
+    # per-column lists is much faster than to_dict('records'), and
+    # tolist() yields native Python values that serialize to JSON.
+    columns = [column for column in CSV_COLUMNS if column in df.columns]
+    values = [df[column].tolist() for column in columns]
+    return zip(df.index.tolist(), (dict(zip(columns, row)) for row in zip(*values)))
+
+
+def clean_product_row(item):
+    """
+    Validate one product dict against the Product field rules.
+    
+    Returns (sku, name, price, inventory_quantity, description) with price as
+    a Decimal and the quantity as an int; raises ValidationError otherwise.
+    """
+    sku = item.get('sku')
+    name = item.get('name')
+    price = item.get('price')
+    inventory_quantity = item.get('inventory_quantity', 0)
+    description = item.get('description', '')
+    
+    if not sku or not name or price is None:
+        raise ValidationError('sku, name and price are required')
+    
+    # pandas may hand quantities over as floats and prices as floats.
+    # Prices go through str() so 29.99 becomes Decimal('29.99'), not
+    # the float's full binary expansion.
+    try:
+        inventory_quantity = int(inventory_quantity or 0)
+    except (TypeError, ValueError):
+        raise ValidationError('inventory_quantity must be a whole number')
+    price = Product._meta.get_field('price').to_python(str(price) if isinstance(price, float) else price)
+    
+    # The database's integer range for PositiveIntegerField is 64-bit on
+    # SQLite, so its validators let negatives through to the CHECK constraint
+    if inventory_quantity < 0:
+        raise ValidationError('inventory_quantity must not be negative')
+    if price < 0:
+        raise ValidationError('price must not be negative')
+    
+    # Lengths, price digits and the quantity range, as the database checks them
+    for field_name, value in zip(PRODUCT_ROW_FIELDS, (sku, name, price, inventory_quantity)):
+        Product._meta.get_field(field_name).run_validators(value)
+    
+    return sku, name, price, inventory_quantity, description
+
+
+def write_inventory_logs(logs, timestamp):
+    """
+    Insert inventory logs, streaming large batches through COPY on PostgreSQL.
+    
+    COPY bypasses the model layer, so change and timestamp are written here.
+    Other databases, and small batches, go through bulk_create.
+    """
+    if connection.vendor != 'postgresql' or len(logs) < COPY_MIN_ROWS:
+        ProductInventoryLog.objects.bulk_create(logs, batch_size=BULK_BATCH_SIZE)
+        return
+    
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (log.product_id, log.previous_quantity, log.new_quantity,
+         log.new_quantity - log.previous_quantity, log.change_type,
+         timestamp.isoformat(), log.notes)
+        for log in logs
+    )
+    buffer.seek(0)
+    
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in (
+        'product_id', 'previous_quantity', 'new_quantity', 'change',
+        'change_type', 'timestamp', 'notes'
+    ))
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {quote(ProductInventoryLog._meta.db_table)} ({columns}) "
+            f"FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({quote('notes')}))",
+            buffer
+        )
+
+
+@shared_task
+def import_products_from_csv(file_path=None):
+    """
+    Import products from a CSV file.
+    
+    Expected CSV format:
+    sku,name,price,inventory_quantity,description
+    
+    Returns a list of dictionaries with imported data. The nightly update
+    streams the file through read_product_chunks() instead of passing the
+    whole list between tasks.
+    """
+    logger.info(f"Starting product import from CSV: {file_path}")
+    
+    file_path = get_import_file_path(file_path)
     
     if not os.path.exists(file_path):
         logger.error(f"CSV file not found: {file_path}")
         return {'status': 'error', 'message': 'CSV file not found', 'imported': 0, 'errors': []}
     
     try:
-        # Read CSV using pandas for better handling
-        df = pd.read_csv(file_path)
-        required_columns = ['sku', 'name', 'price', 'inventory_quantity']
-        
         # Check if all required columns are present
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = get_missing_columns(file_path)
         if missing_columns:
             logger.error(f"Missing required columns: {', '.join(missing_columns)}")
             return {
@@ -70,20 +369,7 @@ def import_products_from_csv(file_path=None):
                 'errors': []
             }
         
-        # Clean data and prepare for import
-        # Convert price to float
-        df['price'] = pd.to_numeric(df['price'], errors='coerce')
-        # Convert inventory to int
-        df['inventory_quantity'] = pd.to_numeric(df['inventory_quantity'], errors='coerce')
-        
-        # Replace NaN with empty string for string columns
-        df['description'] = df['description'].fillna('')
-        
-        # Filter out rows with invalid data
-        valid_data = df.dropna(subset=['sku', 'name', 'price', 'inventory_quantity'])
-        
-        # Convert to list of dictionaries for further processing
-        products_data = valid_data.to_dict('records')
+        products_data = read_products(file_path)
         
         logger.info(f"Found {len(products_data)} valid products in CSV")
         
@@ -109,13 +395,29 @@ def validate_and_update_inventory(import_result):
     """
     Validate imported data and update inventory quantities.
     
-    Takes the result from import_products_from_csv task.
+    Takes the result from import_products_from_csv task, or a nightly chunk
+    whose rows are in the file named by chunk_path.
     """
     if import_result.get('status') != 'success':
         logger.error(f"Cannot validate and update: Previous task failed with {import_result.get('message')}")
         return import_result
     
-    products_data = import_result.get('data', [])
+    if import_result.get('chunk_path'):
+        try:
+            products_data = load_import_chunk(import_result['chunk_path'])
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading import chunk: {str(e)}")
+            return {
+                'status': 'error',
+                'message': f"Error reading import chunk: {str(e)}",
+                'created': 0,
+                'updated': 0,
+                'errors': [str(e)],
+                'error_count': 1,
+                'file_path': import_result.get('file_path')
+            }
+    else:
+        products_data = import_result.get('data', [])
     
     if not products_data:
         logger.info("No products to validate and update")
@@ -134,77 +436,113 @@ def validate_and_update_inventory(import_result):
     errors = []
     
     try:
-        # Process each product
-        for item in products_data:
-            try:
-                sku = item.get('sku')
-                name = item.get('name')
-                price = item.get('price')
-                inventory_quantity = item.get('inventory_quantity', 0)
-                description = item.get('description', '')
+        now = timezone.now()
+        skus = [item.get('sku') for item in products_data if item.get('sku')]
+        
+        # One transaction around a fixed number of bulk statements
+        with transaction.atomic():
+            # sku is unique, so this is an index lookup; load only the columns
+            # compared or written below
+            existing = Product.objects.only(
+                'id', 'sku', 'name', 'price', 'description',
+                'inventory_quantity', 'last_inventory_update'
+            ).in_bulk(skus, field_name='sku')
+            new_products = {}
+            changed_products = {}
+            logs = []
+            
+            for item in products_data:
+                # Skip invalid data; a row the database would reject would
+                # abort the whole chunk's transaction
+                try:
+                    sku, name, price, inventory_quantity, description = clean_product_row(item)
+                except ValidationError as e:
+                    errors.append(f"Invalid data for product {item.get('sku')}: {'; '.join(e.messages)}")
+                    continue
                 
-                # Skip invalid data
-                if not sku or not name or price is None:
-                    errors.append(f"Invalid data for product: {sku}")
+                product = new_products.get(sku)
+                if product is not None:
+                    # Repeated SKU for a product created in this batch: last row wins
+                    product.name = name
+                    product.price = price
+                    product.inventory_quantity = inventory_quantity
+                    product.description = description
                     continue
                 
-                # Use transaction to ensure consistency
-                with transaction.atomic():
-                    product, was_created = Product.objects.get_or_create(
+                product = existing.get(sku)
+                if product is None:
+                    new_products[sku] = Product(
                         sku=sku,
-                        defaults={
-                            'name': name,
-                            'price': price,
-                            'inventory_quantity': inventory_quantity,
-                            'description': description
-                        }
+                        name=name,
+                        price=price,
+                        inventory_quantity=inventory_quantity,
+                        description=description,
+                        last_inventory_update=now
                     )
-                    
-                    if was_created:
-                        created += 1
-                        # Log initial inventory
-                        ProductInventoryLog.objects.create(
-                            product=product,
-                            previous_quantity=0,
-                            new_quantity=inventory_quantity,
-                            change_type='import',
-                            notes='Initial import'
-                        )
-                    else:
-                        # Only update inventory if it changed
-                        if product.inventory_quantity != inventory_quantity:
-                            # Create log before updating
-                            ProductInventoryLog.objects.create(
-                                product=product,
-                                previous_quantity=product.inventory_quantity,
-                                new_quantity=inventory_quantity,
-                                change_type='import',
-                                notes='CSV import update'
-                            )
-                            
-                            # Update the product
-                            product.inventory_quantity = inventory_quantity
-                            product.save()
-                            
-                        # Always update other fields
-                        Product.objects.filter(id=product.id).update(
-                            name=name,
-                            price=price,
-                            description=description
-                        )
-                        updated += 1
-                        
-            except Exception as e:
-                errors.append(f"Error processing product {item.get('sku')}: {str(e)}")
-                logger.error(f"Error processing product {item.get('sku')}: {str(e)}")
+                    continue
+                
+                quantity_changed = product.inventory_quantity != inventory_quantity
+                if not quantity_changed and (product.name, product.price, product.description) == (
+                    name, price, description
+                ):
+                    # Nothing to write for this row
+                    continue
+                
+                # Only log inventory if it changed
+                if quantity_changed:
+                    logs.append(ProductInventoryLog(
+                        product=product,
+                        previous_quantity=product.inventory_quantity,
+                        new_quantity=inventory_quantity,
+                        change_type='import',
+                        notes='CSV import update'
+                    ))
+                    product.inventory_quantity = inventory_quantity
+                    product.last_inventory_update = now
                 
+                # Always update other fields; bulk_update skips auto_now
+                product.name = name
+                product.price = price
+                product.description = description
+                product.updated_at = now
+                changed_products[sku] = product
+            
+            created_products = Product.objects.bulk_create(
+                new_products.values(), batch_size=BULK_BATCH_SIZE
+            )
+            for product in created_products:
+                # Log initial inventory
+                logs.append(ProductInventoryLog(
+                    product=product,
+                    previous_quantity=0,
+                    new_quantity=product.inventory_quantity,
+                    change_type='import',
+                    notes='Initial import'
+                ))
+            
+            Product.objects.bulk_update(
+                changed_products.values(),
+                ['name', 'price', 'description', 'inventory_quantity',
+                 'last_inventory_update', 'updated_at'],
+                batch_size=BULK_BATCH_SIZE
+            )
+            write_inventory_logs(logs, now)
+        
+        created = len(created_products)
+        updated = len(changed_products)
+        
+        # Bulk writes skip post_save, so refresh the search embeddings here
+        if created or updated:
+            transaction.on_commit(schedule_embedding_matrix_rebuild)
+        
         # Return results
         result = {
             'status': 'success',
             'message': f"Processed {len(products_data)} products. Created: {created}, Updated: {updated}, Errors: {len(errors)}",
             'created': created,
             'updated': updated,
-            'errors': errors,
+            'errors': errors[:MAX_RESULT_ERRORS],
+            'error_count': len(errors),
             'file_path': import_result.get('file_path')
         }
         
@@ -218,18 +556,66 @@ def validate_and_update_inventory(import_result):
             'message': f"Error during validation and update: {str(e)}",
             'created': created,
             'updated': updated,
-            'errors': [str(e)] + errors,
+            'errors': ([str(e)] + errors)[:MAX_RESULT_ERRORS],
+            'error_count': len(errors) + 1,
             'file_path': import_result.get('file_path')
         }
 
 
+@shared_task(autoretry_for=(SMTPException,), retry_backoff=True, max_retries=5)
+def send_report_email(subject, message, recipients):
+    """
+    Send an inventory report email, retrying on SMTP errors.
+    """
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=REPORT_FROM_EMAIL,
+        recipient_list=recipients,
+        fail_silently=False,
+    )
+    
+    logger.info(f"Inventory report sent to {recipients}")
+
+
+def merge_update_results(results):
+    """
+    Combine per-chunk validate_and_update_inventory results into one result.
+    
+    The merged status is only an error when every chunk failed; messages from
+    failed chunks are reported as errors.
+    """
+    succeeded = [result for result in results if result.get('status') == 'success']
+    failed = [result for result in results if result.get('status') != 'success']
+    
+    errors = [result.get('message') for result in failed]
+    error_count = len(failed)
+    for result in succeeded:
+        errors.extend(result.get('errors', []))
+        error_count += result.get('error_count', len(result.get('errors', [])))
+    
+    return {
+        'status': 'success' if succeeded or not results else 'error',
+        'message': f"Merged {len(results)} chunk results ({len(failed)} failed)",
+        'created': sum(result.get('created', 0) for result in succeeded),
+        'updated': sum(result.get('updated', 0) for result in succeeded),
+        'errors': errors[:MAX_RESULT_ERRORS],
+        'error_count': error_count,
+        'file_path': next((result['file_path'] for result in results if result.get('file_path')), None)
+    }
+
+
 @shared_task
 def generate_inventory_report(update_result):
     """
     Generate a report summarizing inventory updates and email it.
     
-    Takes the result from validate_and_update_inventory task.
+    Takes the result from validate_and_update_inventory task, or the list of
+    per-chunk results when run as the body of the nightly chord.
     """
+    if isinstance(update_result, list):
+        update_result = merge_update_results(update_result)
+    
     if update_result.get('status') != 'success':
         logger.error(f"Cannot generate report: Previous task failed with {update_result.get('message')}")
         return update_result
@@ -237,23 +623,30 @@ def generate_inventory_report(update_result):
     logger.info("Generating inventory report")
     
     try:
-        # Get stats for the report
-        total_products = Product.objects.count()
-        low_stock_products = Product.objects.filter(inventory_quantity__lt=10).count()
-        out_of_stock_products = Product.objects.filter(inventory_quantity=0).count()
+        # Get stats for the report in a single query
+        stats = Product.objects.aggregate(
+            total=Count('id'),
+            low=Count('id', filter=Q(inventory_quantity__lt=10)),
+            out_of_stock=Count('id', filter=Q(inventory_quantity=0))
+        )
+        total_products = stats['total']
+        low_stock_products = stats['low']
+        out_of_stock_products = stats['out_of_stock']
         
         # Get recent updates (last 24 hours)
-        one_day_ago = timezone.now() - timedelta(days=1)
+        now = timezone.now()
+        now_str = now.strftime('%Y-%m-%d %H:%M:%S')
+        one_day_ago = now - timedelta(days=1)
         recent_updates = ProductInventoryLog.objects.filter(
             timestamp__gte=one_day_ago
         ).count()
         
         # Prepare email content
-        subject = f"Inventory Update Report - {timezone.now().strftime('%Y-%m-%d')}"
+        subject = f"Inventory Update Report - {now_str[:10]}"
         
         # Report data
         report_data = {
-            'date': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'date': now_str,
             'total_products': total_products,
             'low_stock_products': low_stock_products,
             'out_of_stock_products': out_of_stock_products,
@@ -261,7 +654,8 @@ def generate_inventory_report(update_result):
             'file_processed': update_result.get('file_path'),
             'created': update_result.get('created', 0),
             'updated': update_result.get('updated', 0),
-            'errors': update_result.get('errors', [])
+            'errors': update_result.get('errors', []),
+            'error_count': update_result.get('error_count', len(update_result.get('errors', [])))
         }
         
         # Simple text email for the example
@@ -278,40 +672,34 @@ def generate_inventory_report(update_result):
         - File Processed: {report_data['file_processed']}
         - New Products Created: {report_data['created']}
         - Products Updated: {report_data['updated']}
-        - Errors: {len(report_data['errors'])}
+        - Errors: {report_data['error_count']}
         
         """
         
         # Add error details if any
         if report_data['errors']:
-            message += "\nError Details:\n"
-            for error in report_data['errors'][:10]:  # Limit to first 10 errors
-                message += f"- {error}\n"
+            # Limit to first 10 errors
+            message += "\nError Details:\n" + "".join(f"- {error}\n" for error in report_data['errors'][:10])
             
-            if len(report_data['errors']) > 10:
-                message += f"... and {len(report_data['errors']) - 10} more errors\n"
+            shown = min(len(report_data['errors']), 10)
+            if report_data['error_count'] > shown:
+                message += f"... and {report_data['error_count'] - shown} more errors\n"
         
         # In a real application, we'd use HTML email with proper formatting
         # You could use Django's render_to_string to create an HTML template
         
-        # Get recipients from settings or use default
-        recipients = getattr(settings, 'INVENTORY_REPORT_RECIPIENTS', ['admin@example.com'])
+        recipients = REPORT_RECIPIENTS
         
-        # Send the email
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@example.com',
-            recipient_list=recipients,
-            fail_silently=False,
-        )
+        # Send the email from its own task so SMTP latency and retries stay off this worker
+        email = send_report_email.delay(subject, message, recipients)
         
-        logger.info(f"Inventory report sent to {recipients}")
+        logger.info(f"Inventory report queued for {recipients}")
         
-        # Return success
+        # Return success; the email task reports its own delivery
         return {
             'status': 'success',
-            'message': f"Report generated and sent to {', '.join(recipients)}",
+            'message': f"Report generated and queued for {', '.join(recipients)}",
+            'email_task_id': email.id,
             'report_data': report_data
         }
         
@@ -325,18 +713,121 @@ def generate_inventory_report(update_result):
 
 
 @shared_task
-def nightly_inventory_update():
+def compute_product_embedding(product_id):
     """
-    Chain the inventory update tasks together for nightly execution.
+    Compute and store the search embedding for one product.
     """
-    logger.info("Starting nightly inventory update chain")
+    fields = Product.objects.filter(pk=product_id).values_list('name', 'sku', 'description').first()
+    if fields is None:
+        return False
     
-    # Create the task chain
-    task_chain = chain(
-        import_products_from_csv.s(),
-        validate_and_update_inventory.s(),
-        generate_inventory_report.s()
+    text = get_product_text(*fields)
+    embedding = get_embedding(text)
+    if embedding is None:
+        return False
+    
+    # update() writes just these columns and does not fire post_save again
+    Product.objects.filter(pk=product_id).update(
+        embedding=embedding_to_bytes(embedding),
+        embedding_hash=get_text_hash(text)
     )
+    schedule_embedding_matrix_rebuild()
+    return True
+
+
+@shared_task
+def rebuild_embedding_matrix():
+    """
+    Rebuild the product embedding matrix used by semantic search.
+    """
+    count = build_embedding_matrix()
+    logger.info(f"Embedding matrix rebuilt with {count} products")
+    return count
+
+
+@shared_task(ignore_result=True)
+def compute_insights():
+    """
+    Compute the product insights and store them in the cache for the API.
+    """
+    insights = get_product_insights()
+    cache.set(INSIGHTS_CACHE_KEY, insights, timeout=INSIGHTS_CACHE_TIMEOUT)
+    return insights
+
+
+@shared_task
+def nightly_inventory_update(file_path=None):
+    """
+    Run the inventory update for nightly execution.
+    
+    The CSV is streamed in chunks; each chunk is validated and applied by its
+    own task, and a chord collects their results into a single report.
+    Each chunk is saved to a file as soon as it is read, so only one chunk is
+    held in memory and task messages carry just the file's path.
+    """
+    logger.info("Starting nightly inventory update")
+    
+    file_path = get_import_file_path(file_path)
+    
+    if not os.path.exists(file_path):
+        logger.error(f"CSV file not found: {file_path}")
+        return {'status': 'error', 'message': 'CSV file not found', 'imported': 0, 'errors': []}
+    
+    header = []
+    try:
+        missing_columns = get_missing_columns(file_path)
+        if missing_columns:
+            logger.error(f"Missing required columns: {', '.join(missing_columns)}")
+            return {
+                'status': 'error',
+                'message': f"Missing required columns: {', '.join(missing_columns)}",
+                'imported': 0,
+                'errors': []
+            }
+        
+        # Resolve repeated SKUs across the whole file before chunks run in parallel
+        superseded = find_superseded_rows(file_path)
+        
+        # One validate task per chunk, referencing the chunk's saved rows
+        for chunk in read_product_chunks(file_path, skip_rows=superseded):
+            header.append(validate_and_update_inventory.s({
+                'status': 'success',
+                'chunk_path': write_import_chunk(chunk, file_path),
+                'file_path': file_path
+            }))
+    except Exception as e:
+        # Nothing was dispatched; remove the chunks saved so far
+        remove_import_chunks(header)
+        logger.error(f"Error importing products from CSV: {str(e)}")
+        return {
+            'status': 'error',
+            'message': f"Error importing products: {str(e)}",
+            'imported': 0,
+            'errors': [str(e)]
+        }
+    
+    if not header:
+        header = [validate_and_update_inventory.s({'status': 'success', 'data': [], 'file_path': file_path})]
+    
+    # Dispatch the chord and return at once; the chunks run on whichever workers are idle
+    try:
+        result = chord(header, generate_inventory_report.s()).apply_async()
+    except Exception as e:
+        # No task will load the saved chunks, so don't leave them on disk
+        remove_import_chunks(header)
+        logger.error(f"Error dispatching import chunks: {str(e)}")
+        return {
+            'status': 'error',
+            'message': f"Error dispatching import chunks: {str(e)}",
+            'imported': 0,
+            'errors': [str(e)]
+        }
     
-    # Execute the chain
-    return task_chain() 
\ No newline at end of file
+    logger.info(f"Dispatched {len(header)} import chunks from {file_path}")
+    return {
+        'status': 'success',
+        'message': f"Dispatched {len(header)} import chunks",
+        'chunks': len(header),
+        'task_id': result.id,
+        'file_path': file_path
+    }
@@ -1,44 +1,51 @@
+import base64
+import hashlib
+import hmac
+import json
 from decimal import Decimal
+from unittest.mock import MagicMock, patch
 from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from .models import Product, ProductDiscount, ProductInventoryLog
+from . import inventory_log_buffer
 
 
 class ProductAPITestCase(APITestCase):
-    def setUp(self):
-        # Create test user and authenticate
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
+    @classmethod
+    def setUpTestData(cls):
+        # Create test user
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
         
         # Create Product Managers group and add user to it
-        self.product_managers_group, created = Group.objects.get_or_create(name='Product Managers')
-        self.user.groups.add(self.product_managers_group)
+        cls.product_managers_group, created = Group.objects.get_or_create(name='Product Managers')
+        cls.user.groups.add(cls.product_managers_group)
         
         # Give user staff permissions for admin access
-        self.user.is_staff = True
-        self.user.save()
-        
-        self.client = APIClient()
-        self.client.force_authenticate(user=self.user)
+        cls.user.is_staff = True
+        cls.user.save()
         
         # Create test products
-        self.product1 = Product.objects.create(
+        cls.product1 = Product.objects.create(
             name='Test Product 1',
             sku='TP1',
             price=Decimal('19.99'),
             inventory_quantity=100,
             description='Test product 1 description'
         )
-        self.product2 = Product.objects.create(
+        cls.product2 = Product.objects.create(
             name='Test Product 2',
             sku='TP2',
             price=Decimal('29.99'),
             inventory_quantity=5,
             description='Test product 2 description'
         )
-        self.product3 = Product.objects.create(
+        cls.product3 = Product.objects.create(
             name='Different Item',
             sku='DI1',
             price=Decimal('39.99'),
@@ -46,6 +53,11 @@ class ProductAPITestCase(APITestCase):
             description='Different item description'
         )
     
+    def setUp(self):
+        # Authenticate the test user
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
     def test_get_products_list(self):
         """
         Test retrieving product list.
@@ -135,6 +147,43 @@ class ProductAPITestCase(APITestCase):
         self.assertIn('TP2', skus)
         self.assertIn('DI1', skus)
     
+    def test_has_discount_filtering(self):
+        """
+        Test filtering products by active discounts.
+        """
+        ProductDiscount.objects.create(product=self.product1, name='Active', discount_percent=Decimal('10'))
+        ProductDiscount.objects.create(product=self.product1, name='Second', discount_percent=Decimal('5'))
+        ProductDiscount.objects.create(product=self.product2, name='Inactive', discount_percent=Decimal('5'),
+                                       active=False)
+        
+        url = reverse('product-list') + '?has_discount=true'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['sku'] for item in response.data['results']], ['TP1'])
+        
+        url = reverse('product-list') + '?has_discount=false'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        skus = [item['sku'] for item in response.data['results']]
+        self.assertEqual(sorted(skus), ['DI1', 'TP2'])
+    
+    def test_bulk_create_discounts(self):
+        """
+        Test applying one discount to several products.
+        """
+        url = reverse('productdiscount-bulk-create')
+        data = {
+            'product_ids': [self.product1.pk, self.product2.pk, 0],
+            'discount': {'name': 'Summer Sale', 'discount_percent': '15.00'}
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(
+            set(ProductDiscount.objects.filter(name='Summer Sale').values_list('product_id', flat=True)),
+            {self.product1.pk, self.product2.pk}
+        )
+    
     def test_update_inventory(self):
         """
         Test updating inventory via the update_inventory endpoint.
@@ -157,6 +206,14 @@ class ProductAPITestCase(APITestCase):
         self.assertEqual(log.change_type, 'manual')
         self.assertEqual(log.notes, 'Manual inventory update test')
     
+    def test_update_inventory_missing_product(self):
+        """
+        Test updating inventory for a product that does not exist.
+        """
+        url = reverse('product-update-inventory', kwargs={'pk': 0})
+        response = self.client.post(url, {'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
     def test_search_endpoint(self):
         """
         Test the search endpoint.
@@ -170,18 +227,27 @@ class ProductAPITestCase(APITestCase):
         """
         Test the insights endpoint.
         """
+        cache.clear()
         url = reverse('product-insights')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['total_products'], 3)
         self.assertEqual(response.data['low_stock_count'], 2)  # TP2 (qty=5) and DI1 (qty=0)
         self.assertEqual(response.data['out_of_stock_count'], 1)  # DI1 (qty=0)
+        
+        # Later requests are served from the cache without querying
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_products'], 3)
 
 
+# Unsigned webhooks are only accepted in debug; the signature has its own test
+@override_settings(DEBUG=True)
 class ShopifyWebhookTestCase(APITestCase):
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         # Create a test product
-        self.product = Product.objects.create(
+        cls.product = Product.objects.create(
             name='Shopify Product',
             sku='SP1',
             price=Decimal('19.99'),
@@ -210,6 +276,149 @@ class ShopifyWebhookTestCase(APITestCase):
         self.assertEqual(log.new_quantity, 75)
         self.assertEqual(log.change_type, 'webhook')
     
+    @override_settings(SHOPIFY_WEBHOOK_SECRET='webhook-secret')
+    def test_webhook_signature(self):
+        """
+        Test that webhooks must be signed once a secret is configured.
+        """
+        url = reverse('shopify-webhook')
+        body = json.dumps({'id': '12345', 'inventory_quantity': 60}).encode()
+        
+        response = self.client.post(url, body, content_type='application/json',
+                                    HTTP_X_SHOPIFY_HMAC_SHA256='invalid')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        signature = base64.b64encode(hmac.new(b'webhook-secret', body, hashlib.sha256).digest()).decode()
+        response = self.client.post(url, body, content_type='application/json',
+                                    HTTP_X_SHOPIFY_HMAC_SHA256=signature)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_quantity, 60)
+    
+    @override_settings(DEBUG=False, SHOPIFY_WEBHOOK_SECRET='')
+    def test_webhook_rejected_without_secret(self):
+        """
+        Test that webhooks are rejected outside debug when no secret is configured.
+        """
+        url = reverse('shopify-webhook')
+        response = self.client.post(url, {'id': '12345', 'inventory_quantity': 75}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_quantity, 100)
+    
+    @override_settings(INVENTORY_LOG_BUFFER_ENABLED=True)
+    @patch('products.inventory_log_buffer._schedule_flush')
+    def test_webhook_inventory_log_buffered(self, mock_schedule_flush):
+        """
+        Test that buffered webhook logs are written on flush.
+        """
+        url = reverse('shopify-webhook')
+        data = {
+            'id': '12345',
+            'inventory_quantity': 80
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_schedule_flush.assert_called_once()
+        self.assertFalse(ProductInventoryLog.objects.filter(product=self.product).exists())
+        
+        self.assertEqual(inventory_log_buffer.flush(), 1)
+        log = ProductInventoryLog.objects.get(product=self.product)
+        self.assertEqual(log.previous_quantity, 100)
+        self.assertEqual(log.new_quantity, 80)
+        self.assertEqual(log.change, -20)
+    
+    @override_settings(INVENTORY_LOG_BUFFER_ENABLED=True)
+    @patch('products.inventory_log_buffer._schedule_flush')
+    def test_inventory_log_buffer_skips_rolled_back_changes(self, mock_schedule_flush):
+        """
+        Test that a log enqueued in a rolled-back transaction is never buffered.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    inventory_log_buffer.enqueue_log(self.product.pk, 100, 90, 'webhook')
+                    raise ValueError('rolled back')
+            except ValueError:
+                pass
+        
+        mock_schedule_flush.assert_not_called()
+        self.assertEqual(inventory_log_buffer.flush(), 0)
+    
+    @override_settings(INVENTORY_LOG_BUFFER_ENABLED=True)
+    @patch('products.inventory_log_buffer._schedule_flush')
+    def test_inventory_log_buffer_keeps_failed_batch(self, mock_schedule_flush):
+        """
+        Test that a batch that fails to insert is kept for the next flush.
+        """
+        self.addCleanup(inventory_log_buffer._buffer.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory_log_buffer.enqueue_log(self.product.pk, 100, 90, 'webhook')
+        
+        with patch.object(ProductInventoryLog.objects, 'bulk_create', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                inventory_log_buffer.flush()
+        self.assertFalse(ProductInventoryLog.objects.filter(product=self.product).exists())
+        
+        self.assertEqual(inventory_log_buffer.flush(), 1)
+        self.assertEqual(ProductInventoryLog.objects.get(product=self.product).new_quantity, 90)
+    
+    @patch('products.inventory_log_buffer.FLUSH_SIZE', 2)
+    @patch('products.inventory_log_buffer.threading.Timer')
+    def test_inventory_log_buffer_single_flush_timer(self, mock_timer):
+        """
+        Test that a full buffer brings the pending flush forward once instead
+        of starting a flush per entry.
+        """
+        mock_timer.side_effect = lambda interval, function: MagicMock(interval=interval)
+        self.addCleanup(inventory_log_buffer._buffer.clear)
+        self.addCleanup(setattr, inventory_log_buffer, '_timer', None)
+        
+        for quantity in (90, 80, 70, 60):
+            inventory_log_buffer._buffer_log(
+                ProductInventoryLog(product=self.product, previous_quantity=100, new_quantity=quantity)
+            )
+        
+        self.assertEqual([call.args[0] for call in mock_timer.call_args_list], [0.5, 0])
+        self.assertEqual(len(inventory_log_buffer._buffer), 4)
+    
+    @patch('products.inventory_log_buffer.MAX_BUFFERED_LOGS', 2)
+    @patch('products.inventory_log_buffer._schedule_flush')
+    def test_inventory_log_buffer_drops_when_full(self, mock_schedule_flush):
+        """
+        Test that the buffer stops growing once it holds MAX_BUFFERED_LOGS.
+        """
+        self.addCleanup(inventory_log_buffer._buffer.clear)
+        for quantity in (90, 80, 70):
+            inventory_log_buffer._buffer_log(
+                ProductInventoryLog(product=self.product, previous_quantity=100, new_quantity=quantity)
+            )
+        
+        self.assertEqual([log.new_quantity for log in inventory_log_buffer._buffer], [90, 80])
+    
+    def test_webhook_inventory_update_by_sku(self):
+        """
+        Test Shopify webhook inventory update identified by SKU only.
+        """
+        url = reverse('shopify-webhook')
+        data = {
+            'sku': 'SP1',
+            'inventory_quantity': 60
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_quantity, 60)
+    
+    def test_webhook_without_identifier(self):
+        """
+        Test webhook with neither Shopify ID nor SKU.
+        """
+        url = reverse('shopify-webhook')
+        response = self.client.post(url, {'inventory_quantity': 60}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
     def test_webhook_with_invalid_data(self):
         """
         Test webhook with invalid data.
@@ -236,24 +445,49 @@ class ShopifyWebhookTestCase(APITestCase):
 
 
 # Add more tests for the Celery tasks
+from django.core.management import call_command
 from django.test import TestCase
-from .tasks import import_products_from_csv, validate_and_update_inventory, generate_inventory_report
+from .tasks import (
+    import_products_from_csv, validate_and_update_inventory, generate_inventory_report,
+    read_product_chunks, send_report_email, find_superseded_rows, write_import_chunk,
+    nightly_inventory_update
+)
 from unittest.mock import patch, MagicMock
+from celery import Celery
+from django.conf import settings
+import glob
+import io
 import tempfile
 import csv
 import os
 
+class CreateTestDataCommandTestCase(TestCase):
+    def test_skip_existing(self):
+        """
+        Test that --skip-existing leaves already seeded products alone.
+        """
+        call_command('create_test_data', '--products', '3', stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), 3)
+        
+        out = io.StringIO()
+        call_command('create_test_data', '--products', '3', '--skip-existing', stdout=out)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertIn('already exist', out.getvalue())
+
+
 class CeleryTasksTestCase(TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         # Create a test product
-        self.product = Product.objects.create(
+        cls.product = Product.objects.create(
             name='Test Task Product',
             sku='TTP1',
             price=Decimal('19.99'),
             inventory_quantity=100,
             description='Test product for tasks'
         )
-        
+    
+    def setUp(self):
         # Create a temporary CSV file for testing
         self.temp_csv = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
         with open(self.temp_csv.name, 'w', newline='') as csvfile:
@@ -274,6 +508,85 @@ class CeleryTasksTestCase(TestCase):
         self.assertEqual(result['status'], 'success')
         self.assertEqual(len(result['data']), 2)
     
+    def test_read_product_chunks(self):
+        """
+        Test reading products from CSV in chunks.
+        """
+        chunks = list(read_product_chunks(self.temp_csv.name, chunksize=1))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0][0]['sku'], 'TTP1')
+        self.assertEqual(chunks[1][0]['sku'], 'TTP2')
+    
+    def test_read_product_chunks_duplicate_sku(self):
+        """
+        Test that the last row wins when a chunk repeats a SKU.
+        """
+        with open(self.temp_csv.name, 'a', newline='') as csvfile:
+            csv.writer(csvfile).writerow(['TTP1', 'Repeated Task Product', '9.99', '5', ''])
+        
+        products = [product for chunk in read_product_chunks(self.temp_csv.name) for product in chunk]
+        self.assertEqual([product['sku'] for product in products], ['TTP2', 'TTP1'])
+        self.assertEqual(products[1]['name'], 'Repeated Task Product')
+    
+    def test_read_product_chunks_duplicate_sku_across_chunks(self):
+        """
+        Test that a SKU repeated in a later chunk is kept only in that chunk.
+        """
+        with open(self.temp_csv.name, 'a', newline='') as csvfile:
+            csv.writer(csvfile).writerow(['TTP1', 'Repeated Task Product', '9.99', '5', ''])
+        
+        superseded = find_superseded_rows(self.temp_csv.name, chunksize=1)
+        chunks = list(read_product_chunks(self.temp_csv.name, chunksize=1, skip_rows=superseded))
+        self.assertEqual([[product['sku'] for product in chunk] for chunk in chunks], [[], ['TTP2'], ['TTP1']])
+        self.assertEqual(chunks[2][0]['name'], 'Repeated Task Product')
+    
+    def test_read_product_chunks_invalid_repeated_sku(self):
+        """
+        Test that an invalid later row for a SKU doesn't replace its valid row.
+        """
+        with open(self.temp_csv.name, 'a', newline='') as csvfile:
+            csv.writer(csvfile).writerow(['TTP1', 'Broken Task Product', '9.99', '-5', ''])
+        
+        superseded = find_superseded_rows(self.temp_csv.name, chunksize=1)
+        chunks = list(read_product_chunks(self.temp_csv.name, chunksize=1, skip_rows=superseded))
+        self.assertEqual([[product['sku'] for product in chunk] for chunk in chunks], [['TTP1'], ['TTP2'], []])
+        self.assertEqual(chunks[0][0]['name'], 'Updated Task Product')
+        
+        products = [product for chunk in read_product_chunks(self.temp_csv.name) for product in chunk]
+        self.assertEqual([product['name'] for product in products], ['Updated Task Product', 'New Task Product'])
+    
+    @patch('products.tasks.chord', side_effect=ConnectionError('broker unavailable'))
+    def test_nightly_inventory_update_dispatch_failure(self, mock_chord):
+        """
+        Test that saved chunk files are removed when the chord can't be dispatched.
+        """
+        pattern = os.path.join(os.path.dirname(os.path.abspath(self.temp_csv.name)), 'import-chunk-*.json')
+        before = set(glob.glob(pattern))
+        
+        result = nightly_inventory_update(self.temp_csv.name)
+        
+        self.assertEqual(result['status'], 'error')
+        mock_chord.assert_called_once()
+        self.assertEqual(set(glob.glob(pattern)), before)
+    
+    def test_validate_and_update_inventory_from_chunk_file(self):
+        """
+        Test that a chunk saved to a file is applied and the file removed.
+        """
+        chunk_path = write_import_chunk([{
+            'sku': 'TTP1',
+            'name': 'Chunked Task Product',
+            'price': 29.99,
+            'inventory_quantity': 120,
+            'description': ''
+        }], self.temp_csv.name)
+        
+        result = validate_and_update_inventory({'status': 'success', 'chunk_path': chunk_path})
+        
+        self.assertEqual(result['updated'], 1)
+        self.assertFalse(os.path.exists(chunk_path))
+        self.assertEqual(Product.objects.get(sku='TTP1').inventory_quantity, 120)
+    
     def test_validate_and_update_inventory(self):
         """
         Test validating and updating inventory.
@@ -314,8 +627,39 @@ class CeleryTasksTestCase(TestCase):
         self.assertEqual(new_product.name, 'New Task Product')
         self.assertEqual(new_product.inventory_quantity, 200)
     
-    @patch('products.tasks.send_mail')
-    def test_generate_inventory_report(self, mock_send_mail):
+    def test_validate_and_update_inventory_invalid_rows(self):
+        """
+        Test that rows breaking field rules are reported without aborting the batch.
+        """
+        good = {'name': 'Good Product', 'price': 9.99, 'inventory_quantity': 5, 'description': ''}
+        import_result = {
+            'status': 'success',
+            'data': [
+                {**good, 'sku': 'GOOD1'},
+                {**good, 'sku': 'BAD1', 'inventory_quantity': -1},
+                {**good, 'sku': 'BAD2', 'price': 123456789.99},
+                {**good, 'sku': 'BAD3', 'name': 'x' * 300},
+                {**good, 'sku': 'BAD4', 'price': -1.5},
+                {**good, 'sku': 'GOOD2'},
+                {**good, 'sku': 'TTP1', 'inventory_quantity': -5},
+            ],
+            'file_path': self.temp_csv.name
+        }
+        
+        result = validate_and_update_inventory(import_result)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['updated'], 0)
+        self.assertEqual(result['error_count'], 5)
+        self.assertEqual(
+            set(Product.objects.filter(sku__in=['GOOD1', 'GOOD2', 'BAD1', 'BAD2', 'BAD3', 'BAD4']).values_list('sku', flat=True)),
+            {'GOOD1', 'GOOD2'}
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory_quantity, 100)
+    
+    @patch('products.tasks.send_report_email')
+    def test_generate_inventory_report(self, mock_send_report_email):
         """
         Test generating inventory report.
         """
@@ -327,9 +671,136 @@ class CeleryTasksTestCase(TestCase):
             'file_path': self.temp_csv.name
         }
         
+        mock_send_report_email.delay.return_value.id = 'email-task-id'
+        
         result = generate_inventory_report(update_result)
         self.assertEqual(result['status'], 'success')
-        mock_send_mail.assert_called_once()
+        mock_send_report_email.delay.assert_called_once()
+        self.assertEqual(result['email_task_id'], 'email-task-id')
+        self.assertIn('queued for', result['message'])
         self.assertTrue('report_data' in result)
         self.assertEqual(result['report_data']['created'], 1)
         self.assertEqual(result['report_data']['updated'], 1)
+    
+    @patch('products.tasks.send_report_email')
+    def test_generate_inventory_report_from_chunk_results(self, mock_send_report_email):
+        """
+        Test generating a report from per-chunk results.
+        """
+        chunk_results = [
+            {'status': 'success', 'created': 1, 'updated': 2, 'errors': [], 'file_path': self.temp_csv.name},
+            {'status': 'success', 'created': 3, 'updated': 0, 'errors': ['bad row'], 'file_path': self.temp_csv.name},
+            {'status': 'error', 'message': 'chunk failed'},
+        ]
+        
+        result = generate_inventory_report(chunk_results)
+        self.assertEqual(result['status'], 'success')
+        mock_send_report_email.delay.assert_called_once()
+        self.assertEqual(result['report_data']['created'], 4)
+        self.assertEqual(result['report_data']['updated'], 2)
+        self.assertEqual(result['report_data']['errors'], ['chunk failed', 'bad row'])
+        self.assertEqual(result['report_data']['error_count'], 2)
+    
+    def test_publish_task_message(self):
+        """
+        Test that a task message survives publishing with the configured
+        serializer and compression (eager mode in tests never publishes).
+        """
+        app = Celery('publish-test', set_as_current=False)
+        app.config_from_object('django.conf:settings', namespace='CELERY')
+        app.conf.update(broker_url='memory://', task_always_eager=False, task_default_queue='publish-test')
+        
+        app.send_task('products.tasks.send_report_email', args=('Subject', 'Body', ['admin@example.com']))
+        
+        with app.connection_for_read() as connection:
+            queue = connection.SimpleQueue('publish-test', accept=settings.CELERY_ACCEPT_CONTENT)
+            message = queue.get(timeout=1)
+            message.ack()
+            queue.close()
+        self.assertEqual(message.headers['task'], 'products.tasks.send_report_email')
+        self.assertEqual(message.content_type, 'application/x-msgpack')
+        self.assertEqual(list(message.decode()[0]), ['Subject', 'Body', ['admin@example.com']])
+    
+    @patch('products.tasks.send_mail')
+    def test_send_report_email(self, mock_send_mail):
+        """
+        Test sending the inventory report email.
+        """
+        send_report_email('Subject', 'Body', ['admin@example.com'])
+        mock_send_mail.assert_called_once()
+        self.assertEqual(mock_send_mail.call_args.kwargs['recipient_list'], ['admin@example.com'])
+
+
+from .embeddings import (
+    build_embedding_matrix, rank_products, get_embeddings, get_product_text, get_text_hash
+)
+import numpy as np
+
+class EmbeddingSearchTestCase(TestCase):
+    def setUp(self):
+        # Save a small normalized embedding matrix to a temporary file
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.matrix_path = os.path.join(self.temp_dir.name, 'embedding_matrix.npz')
+        matrix = np.array([[1, 0, 0], [0, 1, 0], [0.6, 0.8, 0]], dtype=np.float32)
+        np.savez(self.matrix_path, matrix=matrix, product_ids=np.array([10, 20, 30]))
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_rank_products(self):
+        """
+        Test ranking products by similarity to a query embedding.
+        """
+        index_path = os.path.join(self.temp_dir.name, 'missing.faiss')
+        with override_settings(EMBEDDING_MATRIX_PATH=self.matrix_path, EMBEDDING_INDEX_PATH=index_path):
+            self.assertEqual(rank_products(np.array([0, 1, 0]), limit=2), [20, 30])
+            self.assertEqual(rank_products(np.array([1, 0, 0])), [10, 30, 20])
+    
+    def test_build_embedding_matrix_without_embeddings(self):
+        """
+        Test that building with no embedded products removes the old matrix.
+        """
+        index_path = os.path.join(self.temp_dir.name, 'missing.faiss')
+        with override_settings(EMBEDDING_MATRIX_PATH=self.matrix_path, EMBEDDING_INDEX_PATH=index_path):
+            self.assertEqual(build_embedding_matrix(), 0)
+            self.assertFalse(os.path.exists(self.matrix_path))
+            self.assertEqual(rank_products(np.array([1, 0, 0])), [])
+    
+    @patch('products.tasks.compute_product_embedding.delay')
+    def test_product_text_change_queues_embedding(self, mock_delay):
+        """
+        Test that only changes to a product's text recompute its embedding.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Lamp', sku='LMP1', price=Decimal('9.99'))
+        mock_delay.assert_called_once_with(product.pk)
+        
+        # Pretend the embedding task stored the hash for the current text
+        Product.objects.filter(pk=product.pk).update(
+            embedding_hash=get_text_hash(get_product_text('Lamp', 'LMP1', ''))
+        )
+        product.refresh_from_db()
+        mock_delay.reset_mock()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            product.inventory_quantity = 5
+            product.save()
+        mock_delay.assert_not_called()
+    
+    @patch('products.embeddings.SENTENCE_TRANSFORMER_IMPORT_ERROR', None)
+    @patch(
+        'products.embeddings._encode_many',
+        side_effect=lambda texts: [np.array([len(text), 0.0]) for text in texts]
+    )
+    def test_get_embeddings_uses_cache(self, mock_encode):
+        """
+        Test that embeddings are computed once per distinct text and then cached.
+        """
+        cache.clear()
+        embeddings = get_embeddings(['lamp', 'lamp', 'desk lamp'])
+        mock_encode.assert_called_once_with(['lamp', 'desk lamp'])
+        self.assertEqual([embedding[0] for embedding in embeddings], [4, 4, 9])
+        
+        mock_encode.reset_mock()
+        get_embeddings(['desk lamp'])
+        mock_encode.assert_not_called()
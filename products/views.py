@@ -1,5 +1,13 @@
-from django.db import transaction
-from django.db.models import Avg, Count, Sum, F, ExpressionWrapper, FloatField, Q
+import base64
+import hashlib
+import hmac
+import logging
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import (
+    ExpressionWrapper, FloatField, Q, Case, When, Value, IntegerField
+)
 from django.utils import timezone
 from django.http import HttpResponse
 from django.conf import settings
@@ -11,41 +19,34 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 import django_filters.rest_framework
-import numpy as np
-
-# Import these conditionally to allow migrations to run
-# These will be imported when the view functions that need them are called
-SENTENCE_TRANSFORMER_IMPORT_ERROR = None
-SPACY_IMPORT_ERROR = None
-
-try:
-    import spacy
-except ImportError as e:
-    SPACY_IMPORT_ERROR = str(e)
-    spacy = None
-
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError as e:
-    SENTENCE_TRANSFORMER_IMPORT_ERROR = str(e)
-    SentenceTransformer = None
 
 from django.core.cache import cache
 
-from .models import Product, ProductDiscount, ProductInventoryLog
+from .models import Product, ProductDiscount, ProductInventoryLog, PRODUCT_SEARCH_VECTOR
 from .serializers import (
     ProductSerializer, ProductDetailSerializer, ProductDiscountSerializer,
     WebhookInventoryUpdateSerializer
 )
+from .embeddings import get_embedding, rank_products
 from .filters import ProductFilter
+from .insights import INSIGHTS_CACHE_KEY
+from .inventory_log_buffer import enqueue_log
+from .tasks import compute_insights
 from .permissions import IsInProductManagerGroup, IsAdminUserOrReadOnly
 
+logger = logging.getLogger(__name__)
+
+
+# Discounts per INSERT statement in ProductDiscountViewSet.bulk_create
+DISCOUNT_BULK_CREATE_BATCH_SIZE = 500
+
 
 class ProductViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing products.
     """
-    queryset = Product.objects.all()
+    # The stored search embedding is never serialized
+    queryset = Product.objects.defer('embedding')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsInProductManagerGroup]
     filterset_class = ProductFilter
@@ -57,12 +58,6 @@ class ProductViewSet(viewsets.ModelViewSet):
             return ProductDetailSerializer
         return ProductSerializer
     
-    def get_object(self):
-        try:
-            return super().get_object()
-        except:
-            return None
-    
     @action(detail=True, methods=['post'])
     def update_inventory(self, request, pk=None):
         """
@@ -85,20 +80,18 @@ class ProductViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-            # Create log entry
-            log = ProductInventoryLog(
-                product=product,
-                previous_quantity=product.inventory_quantity,
-                new_quantity=new_quantity,
-                change_type='manual',
-                notes=request.data.get('notes', '')
-            )
+            previous_quantity = product.inventory_quantity
             
-            # Update product quantity
+            # Update product quantity and log the change
             with transaction.atomic():
-                product.inventory_quantity = new_quantity
-                product.save()
-                log.save()
+                product.update_inventory_quantity(new_quantity)
+                ProductInventoryLog.objects.create(
+                    product=product,
+                    previous_quantity=previous_quantity,
+                    new_quantity=new_quantity,
+                    change_type='manual',
+                    notes=request.data.get('notes', '')
+                )
                 
             return Response({'status': 'inventory updated'})
             
@@ -121,46 +114,31 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
             
         # Regular DB search first
-        products = self.filter_queryset(
-            Product.objects.filter(
-                Q(name__icontains=query) | 
-                Q(sku__icontains=query) | 
-                Q(description__icontains=query)
-            )
-        )
+        products = self.filter_queryset(self._text_search(query))
         
         # If few results, try semantic search
         if products.count() < 10 and len(query) > 3:
-            # Try semantic search with sentence-transformers
-            all_products = list(Product.objects.all())
-            
-            # Try to get embeddings from cache first
-            query_embedding = self._get_embedding(query)
+            query_embedding = get_embedding(query)
             
             if query_embedding is not None:
-                product_rankings = []
-                
-                for product in all_products:
-                    # Generate a text representation
-                    product_text = f"{product.name} {product.sku} {product.description}"
-                    product_embedding = self._get_embedding(product_text)
-                    
-                    if product_embedding is not None:
-                        # Calculate similarity
-                        similarity = np.dot(query_embedding, product_embedding)
-                        product_rankings.append((product, similarity))
-                
-                # Sort by similarity and add to results
-                product_rankings.sort(key=lambda x: x[1], reverse=True)
-                
-                # Merge semantically found products with DB results
-                semantic_products = [p[0] for p in product_rankings[:20]]
-                semantic_ids = [p.id for p in semantic_products]
+                # Rank the whole catalog with one matrix-vector product
+                semantic_ids = rank_products(query_embedding)
                 
                 # Add products found semantically that weren't in initial results
-                for product in semantic_products:
-                    if product not in products:
-                        products |= Product.objects.filter(id=product.id)
+                db_ids = list(products.values_list('id', flat=True))
+                db_id_set = set(db_ids)
+                extra_ids = [pk for pk in semantic_ids if pk not in db_id_set]
+                if extra_ids:
+                    # Text matches first, then semantic hits by similarity. The
+                    # order is applied in SQL so the paginator LIMITs there.
+                    ordered_ids = db_ids + extra_ids
+                    # Only the matched rows are loaded, never the whole catalog
+                    products = self.get_queryset().filter(pk__in=ordered_ids).annotate(
+                        _rank=Case(
+                            *[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(ordered_ids)],
+                            output_field=IntegerField()
+                        )
+                    ).order_by('_rank')
         
         # Paginate results
         page = self.paginate_queryset(products)
@@ -171,134 +149,45 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
     
-    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
-    def insights(self, request):
-        """
-        Get insights about products inventory.
+    def _text_search(self, query):
         """
-        # Get basic stats
-        total_products = Product.objects.count()
-        low_stock_count = Product.objects.filter(inventory_quantity__lt=10).count()
-        out_of_stock_count = Product.objects.filter(inventory_quantity=0).count()
-        avg_price = Product.objects.aggregate(avg_price=Avg('price'))['avg_price'] or 0
-        
-        # Percentage calculations
-        low_stock_percentage = (low_stock_count / total_products * 100) if total_products else 0
-        out_of_stock_percentage = (out_of_stock_count / total_products * 100) if total_products else 0
-        
-        # Detect trending products based on inventory changes
-        # Products with most inventory movement in the last 30 days
-        thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-        
-        # Get products with most inventory logs
-        active_products = Product.objects.annotate(
-            log_count=Count('inventory_logs', filter=Q(inventory_logs__timestamp__gte=thirty_days_ago))
-        ).filter(log_count__gt=0).order_by('-log_count')[:5]
-        
-        # Get products with biggest positive inventory changes (restocked items)
-        restocked_products = Product.objects.annotate(
-            total_increase=Sum(
-                'inventory_logs__change',
-                filter=Q(
-                    inventory_logs__change__gt=0,
-                    inventory_logs__timestamp__gte=thirty_days_ago
-                )
-            )
-        ).filter(total_increase__gt=0).order_by('-total_increase')[:5]
+        Products matching the query text.
         
-        # Get products with biggest negative inventory changes (selling fast)
-        selling_products = Product.objects.annotate(
-            total_decrease=Sum(
-                'inventory_logs__change',
-                filter=Q(
-                    inventory_logs__change__lt=0,
-                    inventory_logs__timestamp__gte=thirty_days_ago
-                )
+        On PostgreSQL this is a full-text match ranked by relevance, served by
+        the product_fts GIN index; other databases fall back to substring matching.
+        """
+        queryset = self.get_queryset()
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=query) | 
+                Q(sku__icontains=query) | 
+                Q(description__icontains=query)
             )
-        ).filter(total_decrease__lt=0).order_by('total_decrease')[:5]
         
-        insights = {
-            'total_products': total_products,
-            'low_stock_count': low_stock_count,
-            'low_stock_percentage': round(low_stock_percentage, 1),
-            'out_of_stock_count': out_of_stock_count,
-            'out_of_stock_percentage': round(out_of_stock_percentage, 1),
-            'avg_price': round(float(avg_price), 2) if avg_price else 0,
-            'trending_products': {
-                'most_active': ProductSerializer(active_products, many=True).data,
-                'most_restocked': ProductSerializer(restocked_products, many=True).data,
-                'selling_fast': ProductSerializer(selling_products, many=True).data,
-            }
-        }
-        
-        return Response(insights)
+        search_query = SearchQuery(query, config='english', search_type='websearch')
+        return queryset.annotate(
+            search=PRODUCT_SEARCH_VECTOR,
+            rank=SearchRank(PRODUCT_SEARCH_VECTOR, search_query)
+        ).filter(search=search_query).order_by('-rank')
     
-    def _get_embedding(self, text):
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def insights(self, request):
         """
-        Get embedding for text, using cache when possible.
+        Get insights about products inventory.
         """
-        # Check if AI libraries are available
-        if SENTENCE_TRANSFORMER_IMPORT_ERROR and SPACY_IMPORT_ERROR:
-            # Log that both embedding options are unavailable
-            return None
-            
-        # Create a cache key from text
-        cache_key = f"embedding_{hash(text)}"
-        
-        # Try to get from cache first
-        cached_embedding = cache.get(cache_key)
-        if cached_embedding is not None:
-            return cached_embedding
+        # Served from the cache kept warm by the compute_insights beat task
+        insights = cache.get(INSIGHTS_CACHE_KEY)
+        if insights is None:
+            insights = compute_insights()
         
-        try:
-            # Load model if not already loaded
-            if not hasattr(self, 'embedding_model'):
-                # First try sentence-transformers
-                if SentenceTransformer is not None:
-                    try:
-                        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-                    except Exception as e:
-                        self.embedding_model = None
-                
-                # Fall back to spaCy if needed
-                if self.embedding_model is None and spacy is not None:
-                    try:
-                        self.embedding_model = spacy.load('en_core_web_md')
-                    except:
-                        return None
-                        
-                # If both failed, return None
-                if self.embedding_model is None:
-                    return None
-            
-            # Generate embedding based on model type
-            if SentenceTransformer is not None and isinstance(self.embedding_model, SentenceTransformer):
-                embedding = self.embedding_model.encode(text)
-            elif spacy is not None:  # spaCy model
-                doc = self.embedding_model(text)
-                embedding = doc.vector
-            else:
-                return None
-                
-            # Normalize embedding
-            norm = np.linalg.norm(embedding)
-            if norm > 0:
-                embedding = embedding / norm
-                
-            # Cache the embedding
-            cache.set(cache_key, embedding, timeout=86400)  # Cache for 24 hours
-            
-            return embedding
-        except Exception as e:
-            # In case of errors, return None
-            return None
+        return Response(insights)
 
 
 class ProductDiscountViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing product discounts.
     """
-    queryset = ProductDiscount.objects.all()
+    queryset = ProductDiscount.objects.with_validity()
     serializer_class = ProductDiscountSerializer
     permission_classes = [IsAuthenticated, IsInProductManagerGroup]
     filterset_fields = ['product', 'active']
@@ -317,28 +206,26 @@ class ProductDiscountViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        products = Product.objects.filter(id__in=product_ids)
-        if not products.exists():
+        valid_ids = list(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        if not valid_ids:
             return Response(
                 {'error': 'No valid products found'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        created_discounts = []
+        discount_fields = {
+            'name': discount_data.get('name', 'Bulk Discount'),
+            'discount_percent': discount_data.get('discount_percent', 0),
+            'active': discount_data.get('active', True),
+            'start_date': discount_data.get('start_date', timezone.now()),
+            'end_date': discount_data.get('end_date'),
+        }
         
-        with transaction.atomic():
-            for product in products:
-                # Create discount for each product
-                discount = ProductDiscount(
-                    product=product,
-                    name=discount_data.get('name', 'Bulk Discount'),
-                    discount_percent=discount_data.get('discount_percent', 0),
-                    active=discount_data.get('active', True),
-                    start_date=discount_data.get('start_date', timezone.now()),
-                    end_date=discount_data.get('end_date')
-                )
-                discount.save()
-                created_discounts.append(discount)
+        # Create a discount for each product with multi-row INSERTs
+        created_discounts = ProductDiscount.objects.bulk_create(
+            [ProductDiscount(product_id=product_id, **discount_fields) for product_id in valid_ids],
+            batch_size=DISCOUNT_BULK_CREATE_BATCH_SIZE
+        )
                 
         serializer = ProductDiscountSerializer(created_discounts, many=True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -356,10 +243,10 @@ class ShopifyWebhookView(APIView):
         """
         Handle incoming webhook from Shopify for inventory updates.
         """
-        # Validate webhook signature - in a real app, you'd validate the Shopify HMAC
-        # hmac_header = request.META.get('HTTP_X_SHOPIFY_HMAC_SHA256', '')
-        # if not self._verify_webhook(request.body, hmac_header):
-        #    return Response(status=status.HTTP_401_UNAUTHORIZED)
+        # Validate the Shopify HMAC over the raw body, before DRF parses it
+        hmac_header = request.META.get('HTTP_X_SHOPIFY_HMAC_SHA256', '')
+        if not self._verify_webhook(request.body, hmac_header):
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
         
         serializer = WebhookInventoryUpdateSerializer(data=request.data)
         if not serializer.is_valid():
@@ -374,12 +261,15 @@ class ShopifyWebhookView(APIView):
             sku = serializer.validated_data.get('sku')
             new_quantity = serializer.validated_data.get('inventory_quantity')
             
+            # Only load the columns the inventory update needs
+            products = Product.objects.only('id', 'inventory_quantity')
+            
             product = None
             if shopify_id:
-                product = Product.objects.filter(shopify_id=shopify_id).first()
+                product = products.filter(shopify_id=shopify_id).first()
             
             if not product and sku:
-                product = Product.objects.filter(sku=sku).first()
+                product = products.filter(sku=sku).first()
             
             if not product:
                 return Response(
@@ -387,20 +277,18 @@ class ShopifyWebhookView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
                 
-            # Create inventory log
-            log = ProductInventoryLog(
-                product=product,
-                previous_quantity=product.inventory_quantity,
-                new_quantity=new_quantity,
-                change_type='webhook',
-                notes=f'Shopify webhook update - {timezone.now().isoformat()}'
-            )
+            previous_quantity = product.inventory_quantity
             
-            # Update product inventory
+            # Update product inventory and log the change (buffered under load)
             with transaction.atomic():
-                product.inventory_quantity = new_quantity
-                product.save()
-                log.save()
+                product.update_inventory_quantity(new_quantity)
+                enqueue_log(
+                    product.pk,
+                    previous_quantity,
+                    new_quantity,
+                    'webhook',
+                    notes=f'Shopify webhook update - {timezone.now().isoformat()}'
+                )
                 
             return Response({'status': 'success'})
             
@@ -413,18 +301,16 @@ class ShopifyWebhookView(APIView):
     def _verify_webhook(self, data, hmac_header):
         """
         Verify Shopify webhook signature.
-        In a real app, you would implement this with the proper HMAC validation.
+        Without SHOPIFY_WEBHOOK_SECRET, unsigned webhooks are accepted only
+        while DEBUG is on; otherwise every webhook is rejected.
         """
-        # This is a simplified example, real implementation would be:
-        # import hmac, hashlib, base64
-        # calculated_hmac = base64.b64encode(
-        #     hmac.new(
-        #         settings.SHOPIFY_WEBHOOK_SECRET.encode(), 
-        #         data, 
-        #         hashlib.sha256
-        #     ).digest()
-        # ).decode()
-        # return hmac.compare_digest(calculated_hmac, hmac_header)
+        secret = getattr(settings, 'SHOPIFY_WEBHOOK_SECRET', '')
+        if not secret:
+            if settings.DEBUG:
+                return True
+            logger.error("SHOPIFY_WEBHOOK_SECRET is not set; rejecting webhook")
+            return False
         
-        # For this exercise, we'll just return True
-        return True
+        # hashlib's SHA-256 runs in OpenSSL, so signing the body costs little
+        digest = hmac.new(secret.encode(), data, hashlib.sha256).digest()
+        return hmac.compare_digest(base64.b64encode(digest), hmac_header.encode())
@@ -6,6 +6,18 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shop_integration.settings')
 try:
     from celery import Celery
     from celery.schedules import crontab
+    from kombu import compression
+
+    # kombu has no lz4 codec of its own; register one for the 'lz4' task and
+    # result compression in settings
+    try:
+        import lz4.frame
+    except ImportError:
+        lz4 = None
+    else:
+        compression.register(
+            lz4.frame.compress, lz4.frame.decompress, 'application/x-lz4', aliases=['lz4']
+        )
 
     app = Celery('shop_integration')
 
@@ -13,6 +25,14 @@ try:
     # the configuration object to child processes.
     app.config_from_object('django.conf:settings', namespace='CELERY')
 
+    @app.on_after_configure.connect
+    def use_available_compression(sender, **kwargs):
+        # Without the lz4 codec every publish would fail; fall back to built-in zlib
+        if lz4 is None:
+            for setting in ('task_compression', 'result_compression'):
+                if sender.conf[setting] == 'lz4':
+                    sender.conf[setting] = 'zlib'
+
     # Load task modules from all registered Django app configs.
     app.autodiscover_tasks()
 
@@ -23,6 +43,11 @@ try:
             'schedule': crontab(hour=2, minute=0),  # Run at 2:00 AM every day
             'args': (),
         },
+        'refresh-product-insights': {
+            'task': 'products.tasks.compute_insights',
+            'schedule': crontab(minute='*/15'),  # Every 15 minutes
+            'args': (),
+        },
         # Example schedules you can uncomment:
         # 'hourly-inventory-check': {
         #     'task': 'products.tasks.nightly_inventory_update',
@@ -10,6 +10,19 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': 'db',
         'PORT': '5432',
+        # Reuse connections across requests instead of reconnecting each time;
+        # health checks drop connections the server has closed
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Share the cache between the web and worker containers, so values stored by
+# tasks such as compute_insights are visible to the API
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://redis:6379/1',
     }
 }
 
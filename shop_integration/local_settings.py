@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,6 +18,24 @@ CELERY_TASK_ALWAYS_EAGER = True
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 
+# Tasks run eagerly here, so a per-process cache works without Redis (and for
+# the tests). Beat runs in its own process, though: set CACHE_REDIS_URL (a
+# database other than the broker's, e.g. redis://localhost:6379/1) to share
+# its precomputed insights with runserver.
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Windows-specific Celery settings
 CELERY_WORKER_POOL = 'solo'  # Use solo pool for Windows compatibility
 CELERY_WORKER_CONCURRENCY = 1  # Single worker for Windows 
\ No newline at end of file
@@ -92,6 +92,8 @@ DATABASES = {
         "PASSWORD": os.getenv('POSTGRES_PASSWORD', 'postgres'),
         "HOST": os.getenv('POSTGRES_HOST', 'db'),
         "PORT": os.getenv('POSTGRES_PORT', '5432'),
+        "CONN_MAX_AGE": int(os.getenv('CONN_MAX_AGE', '600')),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -125,9 +127,14 @@ REST_FRAMEWORK = {
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = 'django-db'
-CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
+# msgpack is smaller and faster to encode than JSON for the chunked import
+# payloads; json stays accepted so messages queued before a deploy still run.
+# The lz4 codec is registered with kombu in shop_integration/celery.py.
+CELERY_ACCEPT_CONTENT = ['msgpack', 'json']
+CELERY_TASK_SERIALIZER = 'msgpack'
+CELERY_RESULT_SERIALIZER = 'msgpack'
+CELERY_TASK_COMPRESSION = 'lz4'
+CELERY_RESULT_COMPRESSION = 'lz4'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
@@ -135,16 +142,32 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 # Celery Beat Settings
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
-# Cache settings for embeddings
+# Cache settings for embeddings and product insights; shared through Redis so
+# values computed by beat and the workers reach the web process. Kept off the
+# broker's database: cache.clear() flushes the whole database, queued tasks included.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL', 'redis://redis:6379/1'),
     }
 }
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Shared secret used to verify Shopify webhook signatures; unset disables the check
+SHOPIFY_WEBHOOK_SECRET = os.getenv('SHOPIFY_WEBHOOK_SECRET', '')
+
+# Buffer webhook inventory logs and bulk-insert them in the background
+INVENTORY_LOG_BUFFER_ENABLED = os.getenv('INVENTORY_LOG_BUFFER_ENABLED', 'False') == 'True'
+
+# Product embedding matrix (and FAISS index, when installed) for semantic search,
+# rebuilt in the background at most once per EMBEDDING_MATRIX_REBUILD_DELAY
+# seconds after products change
+EMBEDDING_MATRIX_PATH = BASE_DIR / 'products' / 'data' / 'embedding_matrix.npz'
+EMBEDDING_INDEX_PATH = BASE_DIR / 'products' / 'data' / 'embedding_index.faiss'
+EMBEDDING_MATRIX_REBUILD_DELAY = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators